@@ -227,8 +227,43 @@ const CONFIG = {
     EXCHANGE_RATES: 'infobar_exchange_rates',
     WEATHER: 'infobar_weather',
   },
+  // Upstream API prefixes that `serve.py --proxy` caches under /proxy/
+  API_PROXY_ROUTES: {
+    'https://api.open-meteo.com/v1/forecast': '/proxy/weather',
+    'https://open.er-api.com/v6/latest': '/proxy/fx',
+  },
 };
 
+// ============================================
+// API PROXY
+// ============================================
+
+/**
+ * Check if the page was served by `serve.py --proxy`, which sets this cookie
+ * @returns {boolean} True if /proxy/ routes are available
+ */
+function isApiProxyEnabled() {
+  return document.cookie.split('; ').includes('bs_api_proxy=1');
+}
+
+/**
+ * Route a third-party API URL through the local caching proxy when available,
+ * so a room of kiosks makes one upstream call per TTL instead of one per view
+ * @param {string} url - Upstream API URL
+ * @returns {string} Proxied URL, or the original one
+ */
+function viaApiProxy(url) {
+  if (!isApiProxyEnabled()) {
+    return url;
+  }
+  for (const [upstream, local] of Object.entries(CONFIG.API_PROXY_ROUTES)) {
+    if (url.startsWith(upstream)) {
+      return local + url.slice(upstream.length);
+    }
+  }
+  return url;
+}
+
 // ============================================
 // EXCHANGE RATE SERVICE
 // ============================================
@@ -241,6 +276,10 @@ const ExchangeRateService = {
    * @returns {Promise<object>} Exchange rates relative to PHP
    */
   async fetchRates() {
+    if (isApiProxyEnabled()) {
+      // The local proxy caches open.er-api.com, so skip the per-browser call
+      return this.fetchRatesFallback();
+    }
     try {
       // Using exchangerate.host which is free and supports PHP as base
       const currencies = CONFIG.CURRENCIES.join(',');
@@ -277,7 +316,7 @@ const ExchangeRateService = {
   async fetchRatesFallback() {
     try {
       // Using a different free API as fallback
-      const response = await fetch('https://open.er-api.com/v6/latest/PHP');
+      const response = await fetch(viaApiProxy('https://open.er-api.com/v6/latest/PHP'));
 
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -382,7 +421,9 @@ const WeatherService = {
   async fetchWeather() {
     try {
       const response = await fetch(
-        `https://api.open-meteo.com/v1/forecast?latitude=${CONFIG.SOLANO_LAT}&longitude=${CONFIG.SOLANO_LON}&current_weather=true`
+        viaApiProxy(
+          `https://api.open-meteo.com/v1/forecast?latitude=${CONFIG.SOLANO_LAT}&longitude=${CONFIG.SOLANO_LON}&current_weather=true`
+        )
       );
 
       if (!response.ok) {
@@ -0,0 +1,90 @@
+// Language switcher for pages pre-rendered by scripts/prerender-i18n.py
+// The page already arrives in the right language; switching stores the
+// choice in a cookie for the server and reloads
+
+(function () {
+  'use strict';
+
+  const COOKIE_NAME = 'lang';
+  const COOKIE_MAX_AGE = 365 * 24 * 60 * 60;
+  const SUPPORTED_LANGS = ['en', 'fil', 'ilo'];
+
+  function getCookieLang() {
+    const match = document.cookie.match(/(?:^|;\s*)lang=([^;]*)/);
+    return match ? decodeURIComponent(match[1]) : null;
+  }
+
+  function saveLang(lang) {
+    document.cookie =
+      COOKIE_NAME +
+      '=' +
+      encodeURIComponent(lang) +
+      '; Path=/; Max-Age=' +
+      COOKIE_MAX_AGE +
+      '; SameSite=Lax';
+    try {
+      localStorage.setItem('selectedLang', lang);
+    } catch (e) {
+      // Storage may be unavailable (private mode); the cookie is what counts
+    }
+  }
+
+  function switchLanguage(lang) {
+    if (!SUPPORTED_LANGS.includes(lang) || lang === document.documentElement.lang) return;
+    saveLang(lang);
+    window.location.reload();
+  }
+
+  function updateActiveButton(lang) {
+    document.querySelectorAll('.lang-btn').forEach(function (btn) {
+      const isActive = btn.dataset.lang === lang;
+      btn.classList.toggle('active', isActive);
+      btn.setAttribute('aria-pressed', isActive ? 'true' : 'false');
+      btn.setAttribute('aria-current', isActive ? 'true' : 'false');
+    });
+    document.querySelectorAll('.lang-select').forEach(function (select) {
+      select.value = lang;
+    });
+  }
+
+  function init() {
+    const currentLang = document.documentElement.lang;
+
+    // Carry over a choice made with the client-side translator before the
+    // server rendered pages; the server negotiated without it this time
+    if (!getCookieLang()) {
+      let savedLang = null;
+      try {
+        savedLang = localStorage.getItem('selectedLang');
+      } catch (e) {
+        savedLang = null;
+      }
+      if (SUPPORTED_LANGS.includes(savedLang) && savedLang !== currentLang) {
+        switchLanguage(savedLang);
+        return;
+      }
+      saveLang(currentLang);
+    }
+
+    updateActiveButton(currentLang);
+
+    document.querySelectorAll('.lang-btn').forEach(function (btn) {
+      btn.addEventListener('click', function (e) {
+        e.preventDefault();
+        switchLanguage(this.dataset.lang);
+      });
+    });
+
+    document.querySelectorAll('.lang-select').forEach(function (select) {
+      select.addEventListener('change', function () {
+        switchLanguage(this.value);
+      });
+    });
+  }
+
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', init);
+  } else {
+    init();
+  }
+})();
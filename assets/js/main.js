@@ -110,6 +110,79 @@ function showUpdateBanner(worker) {
   });
 }
 
+// ─── Field Performance Beacons ──────────────────────────────────────────────
+// Only when served by `serve.py --rum`, which sets the bs_rum cookie on pages
+if (document.cookie.split('; ').includes('bs_rum=1') && 'PerformanceObserver' in window) {
+  (function () {
+    var vitals = {};
+    var sent = false;
+
+    function observe(type, callback, options) {
+      try {
+        var observer = new PerformanceObserver(function (list) {
+          list.getEntries().forEach(callback);
+        });
+        observer.observe(Object.assign({ type: type, buffered: true }, options));
+      } catch (e) {
+        // Entry type not supported by this browser
+      }
+    }
+
+    var navigation = performance.getEntriesByType('navigation')[0];
+    if (navigation) {
+      vitals.TTFB = Math.max(navigation.responseStart - (navigation.activationStart || 0), 0);
+    }
+
+    observe('largest-contentful-paint', function (entry) {
+      vitals.LCP = entry.startTime;
+    });
+
+    // Session windows of layout shifts, as web-vitals counts CLS
+    var clsWindow = 0;
+    var clsWindowStart = 0;
+    var clsLast = 0;
+    observe('layout-shift', function (entry) {
+      if (entry.hadRecentInput) return;
+      if (entry.startTime - clsLast > 1000 || entry.startTime - clsWindowStart > 5000) {
+        clsWindow = 0;
+        clsWindowStart = entry.startTime;
+      }
+      clsWindow += entry.value;
+      clsLast = entry.startTime;
+      vitals.CLS = Math.max(vitals.CLS || 0, clsWindow);
+    });
+
+    // Slowest interaction so far, a close stand-in for INP on short visits
+    observe(
+      'event',
+      function (entry) {
+        if (entry.interactionId) {
+          vitals.INP = Math.max(vitals.INP || 0, entry.duration);
+        }
+      },
+      { durationThreshold: 40 }
+    );
+
+    function send() {
+      if (sent || !Object.keys(vitals).length) return;
+      sent = true;
+      var beacon = JSON.stringify({
+        page: location.pathname,
+        lang: document.documentElement.lang,
+        metrics: vitals,
+      });
+      if (!(navigator.sendBeacon && navigator.sendBeacon('/__rum', beacon))) {
+        fetch('/__rum', { method: 'POST', body: beacon, keepalive: true }).catch(function () {});
+      }
+    }
+
+    document.addEventListener('visibilitychange', function () {
+      if (document.visibilityState === 'hidden') send();
+    });
+    window.addEventListener('pagehide', send);
+  })();
+}
+
 document.addEventListener('DOMContentLoaded', () => {
   // Prevent double-click on navigation and header links from causing unintended behavior
   const headerLinks = document.querySelectorAll('.site-header a, .main-nav a, .logo-container a');
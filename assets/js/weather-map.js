@@ -63,6 +63,8 @@
     CACHE_KEY: 'solano_weather_cache',
     CACHE_TTL: 30 * 60 * 1000,
     API_URL: 'https://api.open-meteo.com/v1/forecast',
+    // Cached copy of API_URL when served by `serve.py --proxy` (which sets the cookie)
+    API_PROXY_URL: '/proxy/weather',
     COORDINATES: { lat: 16.5167, lon: 121.1833 },
 
     mapWeatherCode(code) {
@@ -162,7 +164,8 @@
           forecast_days: 1,
         });
 
-        const apiUrl = `${this.API_URL}?${params}`;
+        const useProxy = document.cookie.split('; ').includes('bs_api_proxy=1');
+        const apiUrl = `${useProxy ? this.API_PROXY_URL : this.API_URL}?${params}`;
         console.log('Weather: API URL:', apiUrl);
 
         const response = await fetch(apiUrl, {
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark clean-URL resolution in serve.py.
+Compares the original per-request stat() resolution against the startup-time
+route table by driving both servers with the same keep-alive request mix.
+
+Usage: python3 scripts/bench-routes.py [--directory dist] [--requests 5000]
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlparse, unquote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from serve import CleanURLHandler, CleanURLServer  # noqa: E402
+
+
+class QuietHandler(CleanURLHandler):
+    """Route-table handler without per-request console output"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StatHandler(QuietHandler):
+    """
+    The pre-route-table resolution, up to six stat() calls per request, in
+    place of rewrite_path; GET and HEAD are otherwise served as by QuietHandler
+    """
+
+    def rewrite_path(self):
+        parsed_path = urlparse(self.path)
+        path = unquote(parsed_path.path)
+        self.request_path = path
+
+        if path != '/' and path.endswith('/'):
+            dir_path = '.' + path
+            index_path = dir_path + 'index.html'
+            if os.path.isdir(dir_path) and os.path.isfile(index_path):
+                return self.resolve(path + 'index.html', parsed_path.query)
+
+        file_path = '.' + path
+
+        if not os.path.exists(file_path) and not path.endswith('/'):
+            html_path = file_path + '.html'
+            if os.path.isfile(html_path):
+                return self.resolve(path + '.html', parsed_path.query)
+
+        if os.path.isdir(file_path):
+            index_path = os.path.join(file_path, 'index.html')
+            if os.path.isfile(index_path):
+                return self.resolve(path.rstrip('/') + '/index.html', parsed_path.query)
+
+        return self.resolve(path, parsed_path.query)
+
+    def resolve(self, path, query):
+        self.route_target = path.lstrip('/')
+        self.path = quote(path) + ('?' + query if query else '')
+        return True
+
+
+def clean_urls(routes):
+    """Every page as a clean URL, plus the CSS/JS assets pages pull in"""
+    urls = []
+    for url, target in sorted(routes.items()):
+        if target.endswith('.html') and not url.endswith('.html'):
+            urls.append(url)
+        elif url.startswith('/assets/') and url.endswith(('.css', '.js')):
+            urls.append(url)
+    return urls
+
+
+def drive(port, urls, total, concurrency):
+    """Issue `total` HEAD requests over `concurrency` keep-alive connections"""
+    per_conn = total // concurrency
+
+    def worker(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        for i in range(per_conn):
+            conn.request('HEAD', urls[(offset + i) % len(urls)])
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                raise RuntimeError(f'{response.status} for {urls[(offset + i) % len(urls)]}')
+        conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(0, concurrency * 7, 7)))
+    elapsed = time.perf_counter() - start
+    return per_conn * concurrency / elapsed
+
+
+def start(handler_class, concurrency, **options):
+    httpd = CleanURLServer(('127.0.0.1', 0), handler_class, workers=concurrency, **options)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def bench(urls, args):
+    """Best req/s per server, alternating rounds so machine noise hits both"""
+    # Same file cache on both sides, so only path resolution differs
+    servers = [start(StatHandler, args.concurrency), start(QuietHandler, args.concurrency)]
+    best = [0.0, 0.0]
+    try:
+        for httpd in servers:
+            drive(httpd.server_address[1], urls, len(urls), args.concurrency)  # warm-up
+        for _ in range(args.rounds):
+            for i, httpd in enumerate(servers):
+                rps = drive(httpd.server_address[1], urls, args.requests, args.concurrency)
+                best[i] = max(best[i], rps)
+    finally:
+        for httpd in servers:
+            httpd.shutdown()
+            httpd.server_close()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serve.py clean-URL resolution')
+    parser.add_argument('-d', '--directory', default='dist', help='Directory to serve (default: dist)')
+    parser.add_argument('-n', '--requests', type=int, default=5000, help='Requests per round (default: 5000)')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='Keep-alive connections (default: 4)')
+    parser.add_argument('-r', '--rounds', type=int, default=5, help='Rounds per server, best is kept (default: 5)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory '{args.directory}' not found (run build.sh first)")
+        sys.exit(1)
+    os.chdir(args.directory)
+
+    probe = CleanURLServer(('127.0.0.1', 0), QuietHandler, workers=1)
+    urls = clean_urls(probe.routes.routes)
+    probe.server_close()
+    pages = sum(1 for u in urls if not u.startswith('/assets/'))
+    print(f"Serving {os.getcwd()}: {pages} pages, {len(urls) - pages} assets")
+
+    before, after = bench(urls, args)
+    print(f"  stat() resolution : {before:8.0f} req/s")
+    print(f"  route table       : {after:8.0f} req/s  ({(after / before - 1) * 100:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,749 @@
+#!/usr/bin/env python3
+"""
+Production build into dist/. Each Node tool starts once per batch of files
+instead of once per file, and the stages that don't depend on each other run
+at the same time on a process pool:
+
+  copy    source tree -> dist/, skipping serve.BUILD_EXCLUDES
+  html    html-minifier-terser, pages split into one batch per worker
+  i18n    prerender-i18n.py once html is done (reads the source translations.js)
+  css     clean-css, stylesheets split into one batch per worker
+  js      babel then terser, scripts split into one batch per worker
+  hash    assets renamed to name.<hash>.ext and references to them rewritten
+  critical  critical-css.py inlines each page's above-the-fold CSS, pages in batches
+  compress  .gz and .br copies of every text file, one file per pool task
+  pack    dist.pack for serve.py --pack
+
+Outputs of html, css, js and compress are kept in .build-cache/, keyed by the SHA-256
+of the input, the tool versions and the options, and an unchanged file is
+hardlinked (or copied) back instead of being processed again. Since a cached
+file may share its inode with dist/, later stages must replace files
+(replace_file) rather than rewrite them in place.
+
+Fingerprinted assets never change under a given name, so .htaccess serves
+them with `Cache-Control: immutable`. References are rewritten in src/href
+attributes of every page (pre-rendered languages included), url() in
+stylesheets, sw.js PRECACHE_URLS and manifest.webmanifest icons; an asset
+still named anywhere else (og:image URLs, JSON-LD) also keeps its old name.
+
+The .gz/.br files are compressed at maximum level (serve.compress_body) and
+kept only where smaller than the original. .htaccess hands them to clients
+that accept them, serve.py picks them up as sidecars and pack-site.py stores
+them instead of compressing again. Without the brotli module only .gz is made.
+
+The wall time of every stage and the cache hit/miss counts are printed at the
+end. build.sh and `npm run build` run this script.
+
+--update FILE... brings an existing dist/ up to date for changed or deleted
+source files only, for serve.py --watch: their outputs are removed, then the
+files are copied and run through the same stages. An asset's new hashed name
+means every page, sw.js and the manifest (and the stylesheets, for anything
+but a stylesheet) go through them as well.
+
+Usage: python3 scripts/build.py [--no-bump] [--no-cache] [-j N] [--update FILE...]
+"""
+
+import argparse
+import errno
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from serve import (  # noqa: E402
+    BUILD_EXCLUDES, COMPRESSIBLE_TYPES, I18N_DIR, I18N_LANGS, SIDECAR_SUFFIXES, CleanURLHandler, brotli,
+    compress_body, write_pack,
+)
+
+DIST = 'dist'
+PACK = 'dist.pack'
+CACHE_DIR = '.build-cache'
+NODE_MODULES = 'node_modules'
+
+# Renamed to name.<hash>.ext by the hash stage (site-relative directories)
+FINGERPRINT_DIRS = ('assets/css', 'assets/js', 'assets/images', 'assets/animation')
+FINGERPRINT_TYPES = ('.css', '.js', '.json', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp',
+                     '.ico', '.woff', '.woff2')
+FINGERPRINT_LENGTH = 8
+# name.<hash>.ext -> (name, .ext)
+HASHED_NAME = re.compile(rf'(.*)\.[0-9a-f]{{{FINGERPRINT_LENGTH}}}(\.[^./]+)$')
+# Files searched for leftover references to an asset's old name
+REFERENCE_TYPES = ('.html', '.css', '.js', '.json', '.webmanifest', '.xml', '.txt')
+
+# (prefix, URL) pairs, the URL quoted or bare
+HTML_REFERENCE = re.compile(r'''(\s(?:src|href)\s*=\s*)("[^"]*"|'[^']*'|[^\s"'>]+)''', re.IGNORECASE)
+CSS_REFERENCE = re.compile(r'''(url\(\s*)("[^"]*"|'[^']*'|[^)'"\s]+)''', re.IGNORECASE)
+MANIFEST_REFERENCE = re.compile(r'("src"\s*:\s*)("[^"]*")')
+QUOTED_REFERENCE = re.compile(r'''()("[^"]*"|'[^']*')''')
+PRECACHE_LIST = re.compile(r'(PRECACHE_URLS\s*=\s*\[)([^\]]*)')
+
+# Bump to drop every cached output when the way stages run changes
+CACHE_FORMAT = 1
+
+# Same settings build.sh passed on the html-minifier-terser command line
+HTML_OPTIONS = {
+    'collapseWhitespace': True,
+    'removeComments': True,
+    'removeOptionalTags': True,
+    'removeRedundantAttributes': True,
+    'removeScriptTypeAttributes': True,
+    'removeStyleLinkTypeAttributes': True,
+    'minifyCSS': True,
+    'minifyJS': True,
+}
+CSS_OPTIONS = ['--batch', '--batch-suffix', '']
+TERSER_OPTIONS = {'compress': True, 'mangle': True}
+
+# Minifies a batch of pages in place with one Node process
+NODE_HTML = r"""
+const fs = require('fs');
+const { minify } = require('html-minifier-terser');
+const [options, ...files] = process.argv.slice(1);
+(async () => {
+  for (const file of files) {
+    try {
+      fs.writeFileSync(file, await minify(fs.readFileSync(file, 'utf8'), JSON.parse(options)));
+    } catch (error) {
+      console.error(file + ': ' + (error.message || error));
+      process.exitCode = 1;
+    }
+  }
+})();
+"""
+
+# Transpiles (babel.config.json) and minifies a batch of scripts in place with
+# one Node process
+NODE_JS = r"""
+const fs = require('fs');
+const babel = require('@babel/core');
+const { minify } = require('terser');
+const [options, ...files] = process.argv.slice(1);
+(async () => {
+  for (const file of files) {
+    try {
+      const { code } = await babel.transformAsync(fs.readFileSync(file, 'utf8'), { filename: file });
+      fs.writeFileSync(file, (await minify(code, JSON.parse(options))).code);
+    } catch (error) {
+      console.error(file + ': ' + (error.message || error));
+      process.exitCode = 1;
+    }
+  }
+})();
+"""
+
+# Node packages each stage runs, whose versions are part of its cache key
+STAGE_PACKAGES = {
+    'html': ('html-minifier-terser',),
+    'css': ('clean-css-cli', 'clean-css'),
+    'js': ('@babel/core', '@babel/preset-env', 'terser'),
+    'compress': (),
+}
+
+
+def excluded(name):
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in BUILD_EXCLUDES)
+
+
+def find_files(directory, extension):
+    """Paths (relative to ROOT) of every file under `directory` with `extension`"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(os.path.join(ROOT, directory)):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.endswith(extension):
+                found.append(os.path.relpath(os.path.join(dirpath, name), ROOT))
+    return found
+
+
+def batches(files, count):
+    """`files` dealt round-robin into at most `count` non-empty batches"""
+    return [batch for batch in (files[i::count] for i in range(count)) if batch]
+
+
+def tree_size(path, skip=()):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        if dirpath == path:
+            dirnames[:] = [name for name in dirnames if name not in skip]
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def package_version(name):
+    try:
+        with open(os.path.join(ROOT, NODE_MODULES, name, 'package.json'), encoding='utf-8') as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError):
+        return None
+
+
+def link_or_copy(source, target):
+    """Put `source` at `target` (replacing it) as a hardlink, or a copy across filesystems"""
+    # rename() between two links to one inode is a no-op that would leave temp behind
+    try:
+        if os.path.samefile(source, target):
+            return
+    except OSError:
+        pass
+    temp = f'{target}.{os.getpid()}.tmp'
+    try:
+        os.link(source, temp)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        shutil.copyfile(source, temp)
+    os.replace(temp, target)
+
+
+def replace_file(path, data):
+    """Write `data` to `path` through a new inode, leaving cached copies of it intact"""
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def site_files(dist, extensions):
+    """Site-relative paths of every file in `dist` with one of `extensions`"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(dist):
+        dirnames.sort()
+        prefix = os.path.relpath(dirpath, dist).replace(os.sep, '/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        found += [prefix + name for name in sorted(filenames) if name.endswith(extensions)]
+    return found
+
+
+def hashed_name(rel, data):
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def resolve_reference(base, value):
+    """Site-relative path a URL used under directory `base` points at, or None for other origins"""
+    path = re.split('[?#]', value, maxsplit=1)[0]
+    if not path or ':' in path or path.startswith('//'):
+        return None
+    if path.startswith('/'):
+        return path.lstrip('/')
+    return posixpath.normpath(posixpath.join(base, path))
+
+
+def rewrite_references(pattern, text, base, renamed):
+    """
+    `text` with every URL matched by `pattern` (prefix, URL) that points at a
+    renamed asset switched to the new name, dropping its ?v= cache buster
+    """
+    def replace(match):
+        quote = match[2][0] if match[2][:1] in ('"', "'") else ''
+        value = match[2][1:-1] if quote else match[2]
+        target = renamed.get(resolve_reference(base, value))
+        if target is None:
+            return match[0]
+        path, _, fragment = value.partition('#')
+        path = path.split('?')[0]
+        value = path[:len(path) - len(posixpath.basename(path))] + posixpath.basename(target)
+        if fragment:
+            value += '#' + fragment
+        return match[1] + quote + value + quote
+
+    return pattern.sub(replace, text)
+
+
+def rewrite_file(dist, rel, rewrite):
+    """Apply `rewrite(text)` to a UTF-8 file, replacing it only if something changed"""
+    path = os.path.join(dist, rel)
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    new_text = rewrite(text)
+    if new_text != text:
+        replace_file(path, new_text.encode('utf-8'))
+
+
+def page_base(rel):
+    """URL directory a page is served from (pre-rendered copies stand in for the original)"""
+    parts = rel.split('/')
+    if parts[0] == I18N_DIR and len(parts) > 2:
+        parts = parts[2:]
+    return '/'.join(parts[:-1])
+
+
+def is_fingerprinted(rel):
+    """Whether the hash stage renames this site-relative file"""
+    prefixes = tuple(directory + '/' for directory in FINGERPRINT_DIRS)
+    return rel.startswith(prefixes) and rel.endswith(FINGERPRINT_TYPES)
+
+
+def hashed_names(dist):
+    """{asset: name.<hash>.ext} for the fingerprinted assets already in `dist`"""
+    names = {}
+    for rel in site_files(dist, FINGERPRINT_TYPES):
+        match = HASHED_NAME.match(rel)
+        if match and is_fingerprinted(rel):
+            names[match[1] + match[2]] = rel
+    return names
+
+
+def fingerprint_assets(dist, files=None, names=None):
+    """
+    Rename the assets in FINGERPRINT_DIRS to name.<hash>.ext and rewrite the
+    references to them; returns ({old: new}, old names kept alongside)
+    An update passes the site-relative `files` it has just put back unhashed,
+    and `names` for the assets it left alone
+    """
+    if files is None:
+        files = site_files(dist, '')
+    renamed = dict(names or {})
+    hashed = {}
+    # Stylesheets last, since their hash covers the url()s rewritten into them
+    for rel in sorted(filter(is_fingerprinted, files), key=lambda rel: rel.endswith('.css')):
+        if rel.endswith('.css'):
+            rewrite_file(dist, rel, lambda text: rewrite_references(
+                CSS_REFERENCE, text, posixpath.dirname(rel), renamed))
+        with open(os.path.join(dist, rel), 'rb') as f:
+            renamed[rel] = hashed[rel] = hashed_name(rel, f.read())
+
+    for rel in files:
+        if rel.endswith('.html'):
+            rewrite_file(dist, rel, lambda text: rewrite_references(
+                HTML_REFERENCE, text, page_base(rel), renamed))
+    if 'sw.js' in files and os.path.isfile(os.path.join(dist, 'sw.js')):
+        rewrite_file(dist, 'sw.js', lambda text: PRECACHE_LIST.sub(
+            lambda m: m[1] + rewrite_references(QUOTED_REFERENCE, m[2], '', renamed), text))
+    if 'manifest.webmanifest' in files and os.path.isfile(os.path.join(dist, 'manifest.webmanifest')):
+        rewrite_file(dist, 'manifest.webmanifest', lambda text: rewrite_references(
+            MANIFEST_REFERENCE, text, '', renamed))
+
+    # Anything that still names an asset the old way (absolute og:image URLs,
+    # JSON-LD) keeps working against a copy under that name
+    leftovers = []
+    for rel in site_files(dist, REFERENCE_TYPES):
+        with open(os.path.join(dist, rel), encoding='utf-8', errors='replace') as f:
+            leftovers.append(f.read())
+    leftovers = '\n'.join(leftovers)
+    kept = {rel for rel in renamed if rel in leftovers}
+    for rel, target in renamed.items():
+        path = os.path.join(dist, rel)
+        if rel in hashed:
+            if rel in kept:
+                link_or_copy(path, os.path.join(dist, target))
+            else:
+                os.rename(path, os.path.join(dist, target))
+        # Assets an update left alone may have gained or lost a reference by their old name
+        elif rel in kept and not os.path.exists(path):
+            link_or_copy(os.path.join(dist, target), path)
+        elif rel not in kept:
+            for suffix in ('', *SIDECAR_SUFFIXES.values()):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+    return hashed, kept
+
+
+def precompress(path, encoding):
+    """Write the .gz/.br sidecar of `path` at maximum level (run in a pool worker)"""
+    with open(path, 'rb') as f:
+        body = f.read()
+    replace_file(path + SIDECAR_SUFFIXES[encoding], compress_body(body, encoding))
+
+
+def run_command(command):
+    """One tool invocation, run from a pool worker; returns (exit status, output)"""
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    return result.returncode, (result.stdout + result.stderr).strip()
+
+
+class BuildCache:
+    """
+    Stage outputs stored under their key, .build-cache/<ab>/<abcdef...>; a
+    key covers the input bytes and the stage fingerprint (tool versions,
+    options, the Node script, babel.config.json)
+    """
+
+    def __init__(self, directory, enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, fingerprint, path):
+        digest = hashlib.sha256(fingerprint.encode())
+        with open(os.path.join(ROOT, path), 'rb') as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def restore(self, key, path):
+        """True if a cached output was put at `path`"""
+        hit = False
+        if self.enabled:
+            try:
+                link_or_copy(self.entry(key), os.path.join(ROOT, path))
+                hit = True
+            except FileNotFoundError:
+                pass
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit
+
+    def store(self, key, path):
+        if not self.enabled:
+            return
+        entry = self.entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        link_or_copy(os.path.join(ROOT, path), entry)
+
+
+class Build:
+    """Runs stages on a shared process pool and records their wall times"""
+
+    def __init__(self, jobs, cache):
+        self.jobs = jobs
+        self.cache = cache
+        self.pool = ProcessPoolExecutor(max_workers=jobs)
+        self.timings = []
+        self.lock = threading.Lock()
+
+    def record(self, stage, started, detail):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.timings.append((stage, elapsed, detail))
+            print(f"  {stage:<8} done in {elapsed:6.2f} s  ({detail})")
+
+    def run(self, stage, commands):
+        """Run `commands` side by side on the pool; raises RuntimeError on any failure"""
+        futures = [self.pool.submit(run_command, command) for command in commands]
+        failures = []
+        for future in futures:
+            status, output = future.result()
+            if status != 0:
+                failures.append(output or f'exit status {status}')
+        if failures:
+            raise RuntimeError(f"{stage} failed:\n" + '\n'.join(failures))
+
+    def fingerprint(self, stage, options):
+        parts = {
+            'format': CACHE_FORMAT,
+            'stage': stage,
+            'options': options,
+            'packages': {name: package_version(name) for name in STAGE_PACKAGES[stage]},
+        }
+        if stage == 'js':
+            with open(os.path.join(ROOT, 'babel.config.json'), encoding='utf-8') as f:
+                parts['babel'] = f.read()
+        return json.dumps(parts, sort_keys=True)
+
+    def transform(self, stage, files, options, command):
+        """
+        Process `files` in place with `command(batch)`, restoring the ones
+        whose output is cached and caching the rest
+        """
+        started = time.perf_counter()
+        fingerprint = self.fingerprint(stage, options)
+        pending = {}
+        for path in files:
+            key = self.cache.key(fingerprint, path)
+            if not self.cache.restore(key, path):
+                pending[path] = key
+        work = batches(sorted(pending), self.jobs)
+        self.run(stage, [command(batch) for batch in work])
+        for path, key in pending.items():
+            self.cache.store(key, path)
+        self.record(stage, started, f"{len(files)} files, {len(files) - len(pending)} cached, "
+                                    f"{len(pending)} in {len(work)} batches")
+
+    def copy(self):
+        started = time.perf_counter()
+        shutil.rmtree(os.path.join(ROOT, DIST), ignore_errors=True)
+        shutil.copytree(ROOT, os.path.join(ROOT, DIST), symlinks=True,
+                        ignore=lambda directory, names: [name for name in names if excluded(name)])
+        count = sum(len(filenames) for _, _, filenames in os.walk(os.path.join(ROOT, DIST)))
+        self.record('copy', started, f"{count} files")
+
+    def pipelines(self, stages):
+        """Run independent stages side by side; returns their error messages"""
+        errors = []
+        with ThreadPoolExecutor(max_workers=len(stages)) as pipelines:
+            for future in [pipelines.submit(stage) for stage in stages]:
+                try:
+                    future.result()
+                except RuntimeError as e:
+                    errors.append(str(e))
+        return errors
+
+    def html(self, pages=None):
+        """Minify pages (site-relative, default all) and pre-render their languages"""
+        if pages is None:
+            files = find_files(DIST, '.html')
+        else:
+            files = [os.path.join(DIST, rel) for rel in pages]
+        options = json.dumps(HTML_OPTIONS, sort_keys=True)
+        self.transform('html', files, NODE_HTML + options,
+                       lambda batch: ['node', '-e', NODE_HTML, options, *batch])
+        # Pre-rendered from the minified pages, with the dictionaries read from
+        # the source tree since the js pipeline rewrites dist's copy meanwhile
+        started = time.perf_counter()
+        self.run('i18n', [[sys.executable, os.path.join('scripts', 'prerender-i18n.py'),
+                           '--translations', os.path.join('assets', 'js', 'translations.js'), DIST,
+                           *(pages or [])]])
+        self.record('i18n', started, 'prerender-i18n.py')
+
+    def css(self, styles=None):
+        if styles is None:
+            files = find_files(os.path.join(DIST, 'assets', 'css'), '.css')
+        else:
+            files = [os.path.join(DIST, rel) for rel in styles]
+        cleancss = os.path.join(NODE_MODULES, '.bin', 'cleancss')
+        self.transform('css', files, CSS_OPTIONS, lambda batch: [cleancss, *CSS_OPTIONS, *batch])
+
+    def js(self, scripts=None):
+        if scripts is None:
+            files = find_files(os.path.join(DIST, 'assets', 'js'), '.js')
+        else:
+            files = [os.path.join(DIST, rel) for rel in scripts]
+        options = json.dumps(TERSER_OPTIONS, sort_keys=True)
+        self.transform('js', files, NODE_JS + options,
+                       lambda batch: ['node', '-e', NODE_JS, options, *batch])
+
+    def hash_assets(self):
+        started = time.perf_counter()
+        renamed, kept = fingerprint_assets(os.path.join(ROOT, DIST))
+        self.record('hash', started, f"{len(renamed)} assets, {len(kept)} also kept under the old name")
+
+    def critical_css(self, pages=None):
+        started = time.perf_counter()
+        if pages is None:
+            pages = site_files(os.path.join(ROOT, DIST), ('.html',))
+        work = batches(pages, self.jobs)
+        self.run('critical', [[sys.executable, os.path.join('scripts', 'critical-css.py'), DIST, *batch]
+                              for batch in work])
+        self.record('critical', started, f"{len(pages)} pages in {len(work)} batches")
+
+    def compress(self, files=None):
+        started = time.perf_counter()
+        dist = os.path.join(ROOT, DIST)
+        encodings = [encoding for encoding in SIDECAR_SUFFIXES if encoding != 'br' or brotli is not None]
+        if files is None:
+            files = site_files(dist, '')
+        files = [rel for rel in files if not rel.endswith(tuple(SIDECAR_SUFFIXES.values()))
+                 and CleanURLHandler.content_type(rel).split(';')[0] in COMPRESSIBLE_TYPES]
+        sidecars = []
+        pending = {}
+        for encoding in encodings:
+            fingerprint = self.fingerprint('compress', {'encoding': encoding,
+                                                        'brotli': getattr(brotli, '__version__', None)})
+            for rel in files:
+                path = os.path.join(DIST, rel)
+                sidecar = path + SIDECAR_SUFFIXES[encoding]
+                sidecars.append((path, sidecar))
+                key = self.cache.key(fingerprint, path)
+                if not self.cache.restore(key, sidecar):
+                    pending[sidecar] = (key, self.pool.submit(precompress, os.path.join(ROOT, path), encoding))
+        for sidecar, (key, future) in pending.items():
+            future.result()
+            self.cache.store(key, sidecar)
+
+        # serve.py ignores sidecars older than their file; drop the ones that don't pay off
+        kept = 0
+        for path, sidecar in sidecars:
+            stat = os.stat(os.path.join(ROOT, path))
+            sidecar = os.path.join(ROOT, sidecar)
+            if os.path.getsize(sidecar) >= stat.st_size:
+                os.unlink(sidecar)
+                continue
+            os.utime(sidecar, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            kept += 1
+        note = '' if brotli is not None else ', no .br: brotli module not installed'
+        self.record('compress', started, f"{len(files)} files, {kept} sidecars, "
+                                         f"{len(sidecars) - len(pending)} cached{note}")
+
+    def pack(self):
+        started = time.perf_counter()
+        count, size = write_pack(os.path.join(ROOT, DIST), os.path.join(ROOT, PACK))
+        self.record('pack', started, f"{count} files, {size / 1048576:.1f} MB")
+
+    def update(self, paths):
+        """
+        Bring an existing dist/ up to date after `paths` (source-relative)
+        changed or were deleted, rebuilding only what depends on them
+        A changed asset gets a new hashed name, so every page, sw.js and
+        manifest.webmanifest are rebuilt to point at it, and so are the
+        stylesheets unless only stylesheets changed. Returns error messages
+        """
+        dist = os.path.join(ROOT, DIST)
+        names = hashed_names(dist)
+        redo = set(paths)
+        assets = {rel for rel in redo if is_fingerprinted(rel)}
+        dependents = set()
+        if assets:
+            dependents.update(rel for rel in site_files(dist, ('.html',)) if not rel.startswith(I18N_DIR + '/'))
+            dependents.update(('sw.js', 'manifest.webmanifest'))
+        if any(not rel.endswith('.css') for rel in assets):
+            dependents.update(rel for rel in names if rel.endswith('.css'))
+        redo.update(rel for rel in dependents if os.path.isfile(os.path.join(ROOT, rel)))
+
+        # Every output of a file goes before it is copied back unbuilt: the
+        # hashed name, the language renders and the .gz/.br sidecars
+        started = time.perf_counter()
+        copied = []
+        for rel in sorted(redo):
+            outputs = [rel, names.get(rel)]
+            if rel.endswith('.html'):
+                outputs += [f'{I18N_DIR}/{lang}/{rel}' for lang in I18N_LANGS]
+            for output in filter(None, outputs):
+                for suffix in ('', *SIDECAR_SUFFIXES.values()):
+                    try:
+                        os.unlink(os.path.join(dist, output + suffix))
+                    except FileNotFoundError:
+                        pass
+            if os.path.isfile(os.path.join(ROOT, rel)):
+                os.makedirs(os.path.dirname(os.path.join(dist, rel)), exist_ok=True)
+                shutil.copy2(os.path.join(ROOT, rel), os.path.join(dist, rel))
+                copied.append(rel)
+        self.record('copy', started, f"{len(copied)} files, {len(redo) - len(copied)} removed")
+
+        pages = [rel for rel in copied if rel.endswith('.html')]
+        styles = [rel for rel in copied if rel.startswith('assets/css/') and rel.endswith('.css')]
+        scripts = [rel for rel in copied if rel.startswith('assets/js/') and rel.endswith('.js')]
+        stages = [partial(stage, files) for stage, files in
+                  ((self.html, pages), (self.css, styles), (self.js, scripts)) if files]
+        errors = self.pipelines(stages) if stages else []
+        if errors:
+            return errors
+
+        variants = [f'{I18N_DIR}/{lang}/{rel}' for rel in pages for lang in I18N_LANGS]
+        variants = [rel for rel in variants if os.path.isfile(os.path.join(dist, rel))]
+        started = time.perf_counter()
+        untouched = {rel: target for rel, target in names.items() if rel not in redo}
+        hashed, kept = fingerprint_assets(dist, copied + variants, untouched)
+        self.record('hash', started, f"{len(hashed)} assets, {len(kept)} also kept under the old name")
+        if pages:
+            self.critical_css(pages + variants)
+        outputs = [hashed.get(rel, rel) for rel in copied] + sorted(kept) + variants
+        self.compress([rel for rel in outputs if os.path.isfile(os.path.join(dist, rel))])
+        if os.path.isfile(os.path.join(ROOT, PACK)):
+            self.pack()
+        return []
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def missing_tools():
+    """Node packages the build needs that aren't installed"""
+    needed = [os.path.join(NODE_MODULES, '.bin', 'cleancss')]
+    needed += [os.path.join(NODE_MODULES, name) for name in STAGE_PACKAGES['html'] + STAGE_PACKAGES['js']]
+    missing = [path for path in needed if not os.path.exists(os.path.join(ROOT, path))]
+    if not shutil.which('node'):
+        missing.insert(0, 'node')
+    return missing
+
+
+def update(args):
+    """--update: incremental rebuild of dist/, no version bump and no size report"""
+    if not os.path.isdir(os.path.join(ROOT, DIST)):
+        print(f"Error: {DIST}/ not found (run a full build first)")
+        sys.exit(1)
+    paths = [os.path.relpath(os.path.join(ROOT, path), ROOT).replace(os.sep, '/') for path in args.update]
+    paths = [path for path in paths if not any(excluded(part) for part in path.split('/'))]
+    started = time.perf_counter()
+    build = Build(args.jobs, BuildCache(os.path.join(ROOT, CACHE_DIR), enabled=not args.no_cache))
+    try:
+        errors = build.update(paths)
+    finally:
+        build.close()
+    if errors:
+        for error in errors:
+            print(f"Error: {error}")
+        sys.exit(1)
+    print(f"Updated {DIST}/ for {len(paths)} file(s) in {time.perf_counter() - started:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build minified production files into dist/')
+    parser.add_argument('--no-bump', action='store_true', help="Don't bump the patch version first")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Process every file, ignoring and not filling {CACHE_DIR}/')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes, and batches per tool (default: CPU count)')
+    parser.add_argument('--update', nargs='+', metavar='FILE',
+                        help=f'Only rebuild what depends on these changed or deleted source files '
+                             f'into an existing {DIST}/ (serve.py --watch runs this)')
+    args = parser.parse_args()
+
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    missing = missing_tools()
+    if missing:
+        print(f"Error: {', '.join(missing)} not found (run npm ci first)")
+        sys.exit(1)
+    if args.update:
+        update(args)
+        return
+
+    print("Building BetterSolano for production...")
+    version_script = os.path.join(ROOT, 'scripts', 'version.sh')
+    if not args.no_bump and os.path.isfile(version_script):
+        print("Bumping version...")
+        subprocess.run([version_script, 'patch'], cwd=ROOT, check=True)
+
+    started = time.perf_counter()
+    cache = BuildCache(os.path.join(ROOT, CACHE_DIR), enabled=not args.no_cache)
+    build = Build(args.jobs, cache)
+    try:
+        build.copy()
+        # html -> i18n, css and js are independent pipelines
+        errors = build.pipelines([build.html, build.css, build.js])
+        if errors:
+            for error in errors:
+                print(f"Error: {error}")
+            sys.exit(1)
+        build.hash_assets()
+        build.critical_css()
+        build.compress()
+        build.pack()
+    finally:
+        build.close()
+    elapsed = time.perf_counter() - started
+
+    print("")
+    print(f"{'stage':<9} {'seconds':>8}")
+    for stage, seconds, _ in build.timings:
+        print(f"{stage:<9} {seconds:>8.2f}")
+    print(f"{'total':<9} {elapsed:>8.2f}  (stages add up to {sum(t[1] for t in build.timings):.2f})")
+    if cache.enabled:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses ({CACHE_DIR}/)")
+
+    original = tree_size(ROOT, skip=(NODE_MODULES, DIST, '.git', CACHE_DIR))
+    minified = tree_size(os.path.join(ROOT, DIST))
+    print("")
+    print("Build complete!")
+    print(f"Original size: {original / 1048576:.1f} MB")
+    print(f"Minified size: {minified / 1048576:.1f} MB")
+    print(f"Output: {DIST}/ (packed: {PACK})")
+    print("")
+    print("To preview: python3 serve.py -d dist")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Correctness checks for serve.py, run against every server engine.
+Starts each engine in-process (with the file cache on and off, and serving
+a packed snapshot when --pack is given) and checks
+clean URLs, rewrites, 404s, conditional GETs, compression, ranges, HEAD,
+keep-alive, sendfile bodies, /__metrics and the /proxy/ API cache (against
+a local stand-in upstream).
+
+Usage: python3 scripts/check-server.py [--directory dist] [--engine asyncio] [--pack dist.pack]
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from serve import (  # noqa: E402
+    ENGINES, I18N_LANGS, METRICS_PATH, AsyncCleanURLHandler, AsyncCleanURLServer,
+    PROXY_PREFIX, RUM_PATH, CleanURLHandler, CleanURLServer, Htaccess, PackCache, PackedSite,
+    PackRouteTable,
+)
+
+
+class QuietHandler(CleanURLHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietAsyncHandler(AsyncCleanURLHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+SERVERS = {
+    'threads': (CleanURLServer, QuietHandler),
+    'asyncio': (AsyncCleanURLServer, QuietAsyncHandler),
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Fake weather/FX API: counts calls per path, answers slowly, can be made to fail"""
+
+    def do_GET(self):
+        upstream = self.server
+        with upstream.lock:
+            upstream.calls[self.path] = upstream.calls.get(self.path, 0) + 1
+        time.sleep(upstream.delay)
+        if upstream.failing:
+            self.send_error(503)
+            return
+        body = json.dumps({'path': self.path, 'call': upstream.calls[self.path]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInUpstream(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.delay = 0.2
+        self.failing = False
+        self.base = f'http://127.0.0.1:{self.server_address[1]}'
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition, message):
+    if not condition:
+        raise CheckFailed(message)
+
+
+class Client:
+    """One keep-alive connection; remembers the socket to detect reconnects"""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        self.sockets = set()
+
+    def request(self, method, path, headers=None, body=None):
+        self.conn.request(method, path, body=body, headers=headers or {})
+        self.sockets.add(id(self.conn.sock))
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def close(self):
+        self.conn.close()
+
+
+def pick_paths(routes):
+    """A clean page URL, a compressible asset and the largest routed file"""
+    page = next(url for url, target in sorted(routes.routes.items())
+                if target.endswith('.html') and url != '/' and not url.endswith(('.html', '/')))
+    asset = next(url for url in sorted(routes.routes)
+                 if url.endswith('.css') and os.path.getsize(routes.routes[url]) > 1024)
+    largest = max(routes.routes, key=lambda url: os.path.getsize(routes.routes[url]))
+    return page, asset, largest
+
+
+def check_clean_url(client, site, httpd):
+    response, body = client.request('GET', site['page'])
+    expect(response.status == 200, f"{site['page']}: {response.status}")
+    expect(response.getheader('Content-Type', '').startswith('text/html'), 'clean URL is not text/html')
+    target = httpd.routes.routes[site['page']]
+    # Without a cookie or Accept-Language, --i18n serves the default language's render
+    target = httpd.routes.language_variant(target, I18N_LANGS[0]) or target
+    with open(target, 'rb') as f:
+        expect(body == f.read(), 'clean URL body differs from the file')
+
+
+def check_html_redirect(client, site, httpd):
+    if not httpd.htaccess.rewrite_rules:
+        return 'skipped (no RewriteRules)'
+    response, _ = client.request('GET', site['page'] + '.html')
+    expect(response.status == 301, f".html URL: {response.status}, expected 301")
+    expect(response.getheader('Location', '').endswith(site['page']),
+           f"Location {response.getheader('Location')}")
+    # %N inside THE_REQUEST must reach the Location as text, not as a back-reference
+    response, _ = client.request('GET', site['page'] + '%20x.html')
+    location = unquote(response.getheader('Location') or '')
+    expect(response.status == 301 and location.endswith(site['page'] + '%20x'),
+           f"encoded .html URL: {response.status}, Location {response.getheader('Location')}")
+
+
+def check_not_found(client, site, httpd):
+    response, _ = client.request('GET', '/no-such-page-here')
+    expect(response.status == 404, f"missing page: {response.status}")
+
+
+def check_conditional(client, site, httpd):
+    response, _ = client.request('GET', site['asset'])
+    etag = response.getheader('ETag')
+    last_modified = response.getheader('Last-Modified')
+    expect(last_modified, 'no Last-Modified')
+    response, body = client.request('GET', site['asset'], {'If-Modified-Since': last_modified})
+    expect(response.status == 304 and not body, f"If-Modified-Since: {response.status}")
+    if etag:
+        response, body = client.request('GET', site['asset'], {'If-None-Match': etag})
+        expect(response.status == 304 and not body, f"If-None-Match: {response.status}")
+
+
+def check_caching_headers(client, site, httpd):
+    response, _ = client.request('GET', site['asset'])
+    expect(response.getheader('ETag'), 'no ETag')
+    if httpd.htaccess.expires_for(response.getheader('Content-Type', '')) is None:
+        return 'skipped (no ExpiresByType rule for the asset)'
+    expect(response.getheader('Expires') and response.getheader('Cache-Control'),
+           f"Expires {response.getheader('Expires')}, Cache-Control {response.getheader('Cache-Control')}")
+
+
+def check_gzip(client, site, httpd):
+    response, body = client.request('GET', site['asset'], {'Accept-Encoding': 'gzip'})
+    expect(response.status == 200, f"gzip: {response.status}")
+    with open(httpd.routes.routes[site['asset']], 'rb') as f:
+        identity = f.read()
+    if response.getheader('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    expect(body == identity, 'decoded body differs from the file')
+
+
+def check_ranges(client, site, httpd):
+    with open(httpd.routes.routes[site['asset']], 'rb') as f:
+        identity = f.read()
+    response, body = client.request('GET', site['asset'], {'Range': 'bytes=10-109'})
+    expect(response.status == 206, f"Range: {response.status}")
+    expect(body == identity[10:110], 'range body is wrong')
+    expect(response.getheader('Content-Range') == f'bytes 10-109/{len(identity)}',
+           f"Content-Range {response.getheader('Content-Range')}")
+    response, _ = client.request('GET', site['asset'], {'Range': f'bytes={len(identity) + 10}-'})
+    expect(response.status == 416, f"unsatisfiable Range: {response.status}")
+
+
+def check_head(client, site, httpd):
+    get, _ = client.request('GET', site['page'])
+    head, body = client.request('HEAD', site['page'])
+    expect(head.status == 200 and not body, f"HEAD: {head.status}, {len(body)} body bytes")
+    expect(head.getheader('Content-Length') == get.getheader('Content-Length'),
+           'HEAD and GET Content-Length differ')
+
+
+def check_server_timing(client, site, httpd):
+    response, _ = client.request('GET', site['asset'], {'Accept-Encoding': 'gzip'})
+    timing = response.getheader('Server-Timing', '')
+    phases = [item.split(';')[0].strip() for item in timing.split(',')]
+    expected = ['route', 'cache', 'compress', 'total'] if httpd.cache is not None else ['route', 'compress', 'total']
+    expect(phases == expected, f"Server-Timing phases {phases}, expected {expected}")
+
+
+def check_large_file(client, site, httpd):
+    response, body = client.request('GET', site['largest'])
+    expect(response.status == 200, f"{site['largest']}: {response.status}")
+    with open(httpd.routes.routes[site['largest']], 'rb') as f:
+        expect(body == f.read(), 'large file body differs from the file')
+
+
+def check_metrics(client, site, httpd):
+    response, body = client.request('GET', METRICS_PATH)
+    expect(response.status == 200, f"{METRICS_PATH}: {response.status}")
+    snapshot = json.loads(body)
+    served = sum(route['requests'] for route in snapshot['routes'].values())
+    expect(served > 0, 'no requests recorded')
+    head, body = client.request('HEAD', METRICS_PATH)
+    expect(head.status == 200 and not body, f"HEAD {METRICS_PATH}: {head.status}, {len(body)} body bytes")
+
+
+def check_proxy_cache(client, site, httpd):
+    upstream = site['upstream']
+    first, body = client.request('GET', PROXY_PREFIX + 'fx/PHP')
+    second, again = client.request('GET', PROXY_PREFIX + 'fx/PHP')
+    expect(first.status == 200 and json.loads(body)['path'] == '/v6/latest/PHP',
+           f"proxied fx: {first.status} {body[:60]!r}")
+    expect(second.getheader('X-Proxy-Cache') == 'HIT' and again == body, 'second call was not a cache hit')
+    expect(upstream.calls.get('/v6/latest/PHP') == 1, f"{upstream.calls.get('/v6/latest/PHP')} upstream calls")
+
+
+def check_proxy_single_flight(client, site, httpd):
+    upstream = site['upstream']
+    port = httpd.server_address[1]
+
+    def fetch(_):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        conn.request('GET', PROXY_PREFIX + 'fx/USD')
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        statuses = list(pool.map(fetch, range(3)))
+    expect(statuses == [200] * 3, f"statuses {statuses}")
+    expect(upstream.calls.get('/v6/latest/USD') == 1,
+           f"{upstream.calls.get('/v6/latest/USD')} upstream calls for 3 concurrent misses")
+
+
+def check_proxy_stale(client, site, httpd):
+    upstream = site['upstream']
+    query = 'latitude=16.5&longitude=121.2'
+    response, body = client.request('GET', PROXY_PREFIX + 'weather?' + query)
+    expect(response.status == 200, f"proxied weather: {response.status}")
+    time.sleep(site['weather_ttl'] + 0.1)
+    upstream.failing = True
+    try:
+        stale, stale_body = client.request('GET', PROXY_PREFIX + 'weather?' + query)
+        missing, _ = client.request('GET', PROXY_PREFIX + 'weather?latitude=0')
+    finally:
+        upstream.failing = False
+    expect(stale.status == 200 and stale.getheader('X-Proxy-Cache') == 'STALE' and stale_body == body,
+           f"expired entry with failing upstream: {stale.status} {stale.getheader('X-Proxy-Cache')}")
+    expect(missing.status == 502, f"uncached URL with failing upstream: {missing.status}")
+    _, text = client.request('GET', METRICS_PATH + '?format=prometheus')
+    expect(b'serve_proxy_stale_total 1\n' in text, 'stale answer missing from the Prometheus metrics')
+    response, _ = client.request('GET', PROXY_PREFIX + 'elsewhere/')
+    expect(response.status == 404, f"unknown upstream: {response.status}")
+
+
+def check_language(client, site, httpd):
+    if not httpd.routes.language_files:
+        return 'skipped (no pre-rendered pages, run scripts/prerender-i18n.py)'
+    target = httpd.routes.routes[site['page']]
+    for lang in I18N_LANGS:
+        for headers in ({'Cookie': f'lang={lang}'}, {'Accept-Language': f'{lang};q=0.8, xx'}):
+            response, body = client.request('GET', site['page'], headers)
+            expect(response.status == 200 and response.getheader('Content-Language') == lang,
+                   f"{headers}: {response.status} {response.getheader('Content-Language')}")
+            with open(httpd.routes.language_variant(target, lang), 'rb') as f:
+                expect(body == f.read(), f"{headers}: body differs from the {lang} render")
+    response, _ = client.request('GET', site['page'], {'Cookie': f'lang={I18N_LANGS[1]}'})
+    expect('Cookie' in ', '.join(response.headers.get_all('Vary') or []), 'no Vary: Cookie')
+    response, _ = client.request('GET', site['page'], {'Cookie': 'lang=xx'})
+    expect(response.getheader('Content-Language') == I18N_LANGS[0],
+           f"unknown cookie language: {response.getheader('Content-Language')}")
+
+
+def check_rum(client, site, httpd):
+    beacon = json.dumps({'page': site['page'], 'lang': 'fil', 'metrics': {'LCP': 1800, 'CLS': 0.02}})
+    response, _ = client.request('POST', RUM_PATH, body=beacon)
+    expect(response.status == 204, f"beacon: {response.status}")
+    response, _ = client.request('POST', RUM_PATH, body='{"metrics": {"LCP": -1}}')
+    expect(response.status == 400, f"invalid beacon: {response.status}")
+    response, body = client.request('GET', RUM_PATH)
+    lcp = json.loads(body)['pages'][site['page']]['fil']['LCP']
+    expect(lcp['count'] == 1 and abs(lcp['p75'] - 1800) <= 18, f"LCP summary {lcp}")
+
+
+def check_keep_alive(client, site, httpd):
+    expect(len(client.sockets) == 1, f"{len(client.sockets)} connections for one client")
+
+
+CHECKS = [
+    check_clean_url, check_html_redirect, check_not_found, check_conditional, check_caching_headers,
+    check_gzip, check_ranges, check_head, check_server_timing, check_large_file, check_metrics,
+    check_proxy_cache, check_proxy_single_flight, check_proxy_stale, check_language, check_rum,
+    check_keep_alive,
+]
+
+
+def run_checks(engine, htaccess, cache_size, pack=None):
+    server_class, handler_class = SERVERS[engine]
+    upstream = StandInUpstream()
+    weather_ttl = 1
+    options = {'proxy_upstreams': {
+        'weather': (upstream.base + '/v1/forecast', weather_ttl),
+        'fx': (upstream.base + '/v6/latest', 3600),
+    }, 'i18n': True}
+    rum_dir = tempfile.TemporaryDirectory()
+    options['rum_path'] = os.path.join(rum_dir.name, 'rum.jsonl')
+    if pack is not None:
+        options.update(routes=PackRouteTable(pack), cache=PackCache(pack), pack=pack)
+    httpd = server_class(('127.0.0.1', 0), handler_class, workers=4, cache_size=cache_size,
+                         htaccess=htaccess, **options)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    page, asset, largest = pick_paths(httpd.routes)
+    site = {'page': page, 'asset': asset, 'largest': largest,
+            'upstream': upstream, 'weather_ttl': weather_ttl}
+    client = Client(httpd.server_address[1])
+    failures = 0
+    try:
+        for check in CHECKS:
+            name = check.__name__.removeprefix('check_')
+            try:
+                note = check(client, site, httpd)
+                print(f"  ok    {name}" + (f" {note}" if note else ''))
+            except (CheckFailed, OSError, http.client.HTTPException, KeyError, ValueError) as e:
+                failures += 1
+                print(f"  FAIL  {name}: {e}")
+    finally:
+        client.close()
+        httpd.shutdown()
+        thread.join(5)
+        httpd.server_close()
+        upstream.shutdown()
+        upstream.server_close()
+        rum_dir.cleanup()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check serve.py behaviour on every engine')
+    parser.add_argument('-d', '--directory', default='dist', help='Directory to serve (default: dist)')
+    parser.add_argument('--engine', choices=ENGINES, action='append',
+                        help='Engine to check (repeatable; default: all)')
+    parser.add_argument('--pack', metavar='FILE', help='Also check serving this pack of --directory')
+    args = parser.parse_args()
+    pack = PackedSite(os.path.abspath(args.pack)) if args.pack else None
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory '{args.directory}' not found (run build.sh first)")
+        sys.exit(1)
+    os.chdir(args.directory)
+    htaccess = Htaccess('.htaccess') if os.path.isfile('.htaccess') else Htaccess()
+
+    failures = 0
+    for engine in args.engine or ENGINES:
+        for cache_size, label in ((64 * 1024 * 1024, 'cache on'), (0, 'cache off')):
+            print(f"{engine} ({label}):")
+            failures += run_checks(engine, htaccess, cache_size)
+        if pack is not None:
+            print(f"{engine} (pack):")
+            failures += run_checks(engine, htaccess, 0, pack)
+    print(f"{failures} failure(s)" if failures else "All checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Inline the critical CSS of every page so the first paint doesn't wait for
+the stylesheets. For each page, the rules of its local stylesheets that can
+match an element above the fold (everything before <main>, plus its first
+FOLD_SECTIONS sections) go into a <style> where the first stylesheet was
+linked; the <link rel="stylesheet">s become preloads that apply themselves
+once loaded, with a <noscript> fallback.
+
+Matching checks each compound selector against the tag, classes, id and
+attributes of a single element and ignores combinators, so it errs on the
+side of inlining too much. Interaction states (:hover, :focus, ...) are left
+to the full stylesheets.
+
+Usage: python3 scripts/critical-css.py [dist] [page.html ...]
+"""
+
+import argparse
+import html
+import os
+import posixpath
+import re
+import sys
+from html.parser import HTMLParser
+
+from build import page_base
+
+# Top-level <section>s of <main> counted as above the fold
+FOLD_SECTIONS = 2
+
+# Characters of a page fed to the parser at a time, to stop at the fold
+SCAN_CHUNK = 8192
+
+# At-rules whose body is more rules, searched recursively
+NESTED_AT_RULES = {'media', 'supports', 'layer', 'container'}
+
+INTERACTION = re.compile(r':(?:hover|focus|focus-visible|focus-within|active|visited)\b')
+PSEUDO = re.compile(r'::?[\w-]+(?:\([^()]*(?:\([^()]*\)[^()]*)*\))?')
+ATTRIBUTE = re.compile(r'\[\s*([\w-]+)[^\]]*\]')
+COMBINATOR = re.compile(r'\s*[>+~]\s*|\s+')
+IDENT = r'((?:\\.|[\w-])+)'
+ANIMATION = re.compile(r'animation(?:-name)?\s*:\s*([^;}]+)')
+CSS_URL = re.compile(r'''url\(\s*(["']?)([^)'"]+)\1\s*\)''')
+
+# Elements every page renders, even when the minifier dropped their tags
+IMPLICIT_ELEMENTS = [('html', frozenset(), None, frozenset()), ('body', frozenset(), None, frozenset())]
+
+
+def skip_string(text, i):
+    """Index just past the string literal starting at text[i]"""
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == '\\' else 1
+    return i + 1
+
+
+def read_until(text, i, stops):
+    """Index of the first character in `stops` at or after i, outside strings, comments and parens"""
+    depth = 0
+    while i < len(text):
+        char = text[i]
+        if char in '"\'':
+            i = skip_string(text, i)
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = len(text) if end < 0 else end + 2
+            continue
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif depth <= 0 and char in stops:
+            return i
+        i += 1
+    return i
+
+
+def block_end(text, i):
+    """Index just past the '}' closing the block whose '{' is at text[i]"""
+    depth = 0
+    while i < len(text):
+        char = text[i]
+        if char in '"\'':
+            i = skip_string(text, i)
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = len(text) if end < 0 else end + 2
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def parse_css(text, i=0):
+    """
+    Stylesheet as nodes: ('rule', [(selector, compiled selector)],
+    declarations), ('group', prelude, nodes) for @media and friends, ('raw',
+    name, text) for other at-rules; returns (nodes, index after the closing brace)
+    """
+    nodes = []
+    while i < len(text):
+        stop = read_until(text, i, '{};')
+        prelude = re.sub(r'/\*.*?\*/', '', text[i:stop], flags=re.S).strip()
+        if stop >= len(text) or text[stop] == '}':
+            return nodes, stop + 1
+        if text[stop] == ';':
+            if prelude:
+                nodes.append(('raw', prelude.split()[0][1:].lower(), prelude + ';'))
+            i = stop + 1
+            continue
+        name = prelude[1:].split(None, 1)[0].split('(')[0].lower() if prelude.startswith('@') else None
+        if name in NESTED_AT_RULES:
+            children, i = parse_css(text, stop + 1)
+            nodes.append(('group', prelude, children))
+            continue
+        end = block_end(text, stop)
+        if name is not None:
+            nodes.append(('raw', name, prelude + text[stop:end]))
+        else:
+            selectors = [(selector, compile_selector(selector)) for selector in split_selectors(prelude)]
+            nodes.append(('rule', selectors, text[stop + 1:end - 1]))
+        i = end
+    return nodes, i
+
+
+def split_selectors(selectors):
+    parts = []
+    start = 0
+    while True:
+        stop = read_until(selectors, start, ',')
+        parts.append(selectors[start:stop].strip())
+        if stop >= len(selectors):
+            return parts
+        start = stop + 1
+
+
+def unescape(ident):
+    return re.sub(r'\\(.)', r'\1', ident)
+
+
+def compile_selector(selector):
+    """
+    The (tag, classes, ids, attributes) of each compound in a selector,
+    pseudo-classes dropped; None for interaction states
+    """
+    if INTERACTION.search(selector):
+        return None
+    bare = PSEUDO.sub('', ATTRIBUTE.sub(lambda m: f'[{m[1]}]', selector))
+    compounds = []
+    for part in COMBINATOR.split(bare.strip()):
+        if not part or part == '*':
+            continue
+        tag = re.match(r'[a-zA-Z][\w-]*', part)
+        compounds.append((
+            tag[0].lower() if tag else None,
+            frozenset(unescape(name) for name in re.findall(r'\.' + IDENT, part)),
+            frozenset(unescape(name) for name in re.findall(r'#' + IDENT, part)),
+            frozenset(re.findall(r'\[([\w-]+)\]', part)),
+        ))
+    return tuple(compounds)
+
+
+class Matcher:
+    """Answers whether a compiled selector can match one of a page's above-the-fold elements"""
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.classes = set().union(*(element[1] for element in elements))
+        self.ids = {element[2] for element in elements}
+        self.compounds = {}
+
+    def compound(self, compound):
+        result = self.compounds.get(compound)
+        if result is None:
+            tag, classes, ids, attrs = compound
+            result = classes <= self.classes and ids <= self.ids and any(
+                (tag is None or tag == e_tag) and classes <= e_classes
+                and (not ids or ids == {e_id}) and attrs <= e_attrs
+                for e_tag, e_classes, e_id, e_attrs in self.elements)
+            self.compounds[compound] = result
+        return result
+
+    def selector(self, compounds):
+        return compounds is not None and all(self.compound(compound) for compound in compounds)
+
+
+def critical_nodes(nodes, matcher):
+    """(CSS text of the nodes that can apply above the fold, animation names they use)"""
+    out = []
+    animations = set()
+    keyframes = []
+    for kind, head, body in nodes:
+        if kind == 'rule':
+            selectors = [text for text, compounds in head if matcher.selector(compounds)]
+            if selectors:
+                out.append(','.join(selectors) + '{' + body + '}')
+                for value in ANIMATION.findall(body):
+                    animations.update(re.findall(r'[\w-]+', value))
+        elif kind == 'group':
+            text, used = critical_nodes(body, matcher)
+            if text:
+                out.append(head + '{' + text + '}')
+                animations |= used
+        elif head == 'font-face':
+            out.append(body)
+        elif head.endswith('keyframes'):
+            keyframes.append(body)
+    for body in keyframes:
+        name = body.split('{', 1)[0].split()[-1]
+        if name in animations:
+            out.append(body)
+    return ''.join(out), animations
+
+
+class PageScanner(HTMLParser):
+    """Collects the elements above the fold and the local stylesheet links of a page"""
+
+    def __init__(self, source):
+        super().__init__(convert_charrefs=True)
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+        self.elements = set(IMPLICIT_ELEMENTS)
+        self.links = []
+        self.in_noscript = 0
+        self.in_main = 0
+        self.open_sections = 0
+        self.sections = 0
+        self.folded = False
+
+    def position(self):
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        # <noscript> links are the fallbacks written by an earlier run
+        if tag == 'noscript':
+            self.in_noscript += 1
+        elif tag == 'link' and not self.in_noscript and 'stylesheet' in (attributes.get('rel') or '').lower().split():
+            href = attributes.get('href') or ''
+            if href and ':' not in href.split('/')[0] and not href.startswith('//'):
+                start = self.position()
+                self.links.append((start, start + len(self.get_starttag_text()), attrs))
+        if tag == 'main':
+            self.in_main += 1
+        elif tag == 'section' and self.in_main:
+            if not self.open_sections:
+                self.sections += 1
+                self.folded = self.folded or self.sections > FOLD_SECTIONS
+            self.open_sections += 1
+        if not self.folded:
+            self.elements.add((tag, frozenset((attributes.get('class') or '').split()),
+                               attributes.get('id'), frozenset(attributes)))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag == 'section' and self.in_main:
+            self.open_sections -= 1
+
+    def handle_endtag(self, tag):
+        if tag == 'noscript' and self.in_noscript:
+            self.in_noscript -= 1
+        elif tag == 'main':
+            self.in_main -= 1
+            # The footer and anything else after <main> is below the fold
+            self.folded = self.folded or self.sections > 0
+        elif tag == 'section' and self.in_main and self.open_sections:
+            self.open_sections -= 1
+
+
+def absolute_urls(css, sheet):
+    """Relative url()s of a stylesheet made site-absolute, for inlining into any page"""
+    def replace(match):
+        url = match[2]
+        if ':' in url or url.startswith(('/', '#')):
+            return match[0]
+        return f'url({match[1]}/{posixpath.normpath(posixpath.join(posixpath.dirname(sheet), url))}{match[1]})'
+
+    return CSS_URL.sub(replace, css)
+
+
+def async_link(attrs):
+    """A stylesheet <link> as a preload that applies itself, plus the <noscript> original"""
+    def attribute(name, value):
+        if value is None:
+            return ' ' + name
+        # Double-quoted, so the onload handler's single quotes stay as they are
+        return ' ' + name + '="' + html.escape(value, quote=False).replace('"', '&quot;') + '"'
+
+    def tag(pairs):
+        return '<link' + ''.join(attribute(name, value) for name, value in pairs) + '>'
+
+    preload = [(name, 'preload' if name == 'rel' else value) for name, value in attrs]
+    preload += [('as', 'style'), ('onload', "this.onload=null;this.rel='stylesheet'")]
+    return tag(preload) + '<noscript>' + tag(attrs) + '</noscript>'
+
+
+class CriticalCSS:
+    """Per-site state: parsed stylesheets are reused across pages"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.sheets = {}
+
+    def sheet(self, rel):
+        nodes = self.sheets.get(rel)
+        if nodes is None:
+            with open(os.path.join(self.directory, rel), encoding='utf-8') as f:
+                nodes = parse_css(f.read())[0]
+            self.sheets[rel] = nodes
+        return nodes
+
+    def inline(self, rel):
+        """Rewrite one page; returns the inlined CSS size, or None if it has no local stylesheets"""
+        path = os.path.join(self.directory, rel)
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        if 'stylesheet' not in source:
+            return None
+        # The rest of the page can't add critical elements once past the fold
+        scanner = PageScanner(source)
+        for offset in range(0, len(source), SCAN_CHUNK):
+            scanner.feed(source[offset:offset + SCAN_CHUNK])
+            if scanner.folded:
+                break
+        else:
+            scanner.close()
+
+        matcher = Matcher(scanner.elements)
+        critical = []
+        links = []
+        for start, end, attrs in scanner.links:
+            href = dict(attrs)['href'].split('?')[0].split('#')[0]
+            sheet = href.lstrip('/') if href.startswith('/') else posixpath.normpath(
+                posixpath.join(page_base(rel), href))
+            if not os.path.isfile(os.path.join(self.directory, sheet)):
+                continue
+            css = critical_nodes(self.sheet(sheet), matcher)[0]
+            media = dict(attrs).get('media')
+            if media and media != 'all':
+                css = f'@media {media}{{{css}}}'
+            critical.append(absolute_urls(css, sheet))
+            links.append((start, end, attrs))
+        if not links:
+            return None
+
+        style = '<style>' + ''.join(critical).replace('</', '<\\/') + '</style>'
+        parts = []
+        position = 0
+        for index, (start, end, attrs) in enumerate(links):
+            parts.append(source[position:start])
+            parts.append((style if index == 0 else '') + async_link(attrs))
+            position = end
+        parts.append(source[position:])
+        # A new file, not a rewrite: dist/ pages may be hardlinks into the build cache
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
+        os.replace(temp, path)
+        return len(style)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inline above-the-fold CSS into every page')
+    parser.add_argument('directory', nargs='?', default='dist', help='Built site (default: dist)')
+    parser.add_argument('pages', nargs='*', help='Only these pages (paths inside the site)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory '{args.directory}' not found (run build.sh first)")
+        sys.exit(1)
+
+    pages = args.pages
+    if not pages:
+        for dirpath, _, filenames in os.walk(args.directory):
+            rel_dir = os.path.relpath(dirpath, args.directory).replace(os.sep, '/')
+            pages += [posixpath.normpath(posixpath.join(rel_dir, name))
+                      for name in filenames if name.endswith('.html')]
+
+    site = CriticalCSS(args.directory)
+    sizes = [size for size in (site.inline(rel) for rel in sorted(pages)) if size is not None]
+    if sizes:
+        print(f"Inlined critical CSS into {len(sizes)} pages "
+              f"(average {sum(sizes) / len(sizes) / 1024:.1f} KB, largest {max(sizes) / 1024:.1f} KB)")
+    else:
+        print("No pages with local stylesheets")
+
+
+if __name__ == '__main__':
+    main()
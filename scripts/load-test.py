@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Load generator for serve.py (standard library only).
+Drives a running server at a fixed concurrency over keep-alive connections and
+reports requests/sec, latency percentiles, error rate and bytes/sec.
+
+URL sources (first one given wins):
+  --urls FILE       one path or URL per line
+  --sitemap FILE    every <loc> in a sitemap, mapped onto --base-url
+  --crawl           follow same-origin href/src links starting from /
+  (default: sitemap.xml when present, otherwise --crawl)
+
+Usage:
+  python3 scripts/load-test.py --base-url http://localhost:8080 -c 16 -d 30 -o after.json
+  python3 scripts/load-test.py --compare before.json after.json
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+# Percentiles reported and compared
+PERCENTILES = (50, 90, 95, 99)
+
+# Relative change treated as a regression by --compare (percent)
+DEFAULT_THRESHOLD = 5.0
+
+
+class LinkParser(HTMLParser):
+    """Collects href/src attribute values from a page"""
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if name in ('href', 'src') and value:
+                self.links.append(value)
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[max(math.ceil(pct / 100 * len(sorted_samples)) - 1, 0)]
+
+
+def request_path(url):
+    """Path plus query of a URL, for http.client"""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    return path + ('?' + parts.query if parts.query else '')
+
+
+def urls_from_file(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [request_path(line) for line in lines if line and not line.startswith('#')]
+
+
+def urls_from_sitemap(path):
+    tree = ET.parse(path)
+    locs = tree.getroot().iter(SITEMAP_NS + 'loc')
+    return [request_path(loc.text.strip()) for loc in locs if loc.text]
+
+
+def crawl(base_url, max_urls):
+    """Breadth-first crawl of same-origin links, pages and assets alike"""
+    origin = urlsplit(base_url)
+    conn = http.client.HTTPConnection(origin.hostname, origin.port or 80, timeout=10)
+    seen = {'/'}
+    queue = ['/']
+    found = []
+    while queue and len(found) < max_urls:
+        path = queue.pop(0)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            continue
+        if response.status >= 400:
+            continue
+        found.append(path)
+        if 'text/html' not in (response.getheader('Content-Type') or ''):
+            continue
+
+        parser = LinkParser()
+        parser.feed(body.decode('utf-8', errors='replace'))
+        for link in parser.links:
+            absolute = urljoin(base_url + path, link.split('#')[0])
+            parts = urlsplit(absolute)
+            if parts.scheme not in ('http', 'https') or parts.netloc != origin.netloc:
+                continue
+            target = request_path(absolute)
+            if target not in seen:
+                seen.add(target)
+                queue.append(target)
+    conn.close()
+    return found
+
+
+def run_load(base_url, urls, concurrency, duration, total, headers):
+    """Hammer the server; returns raw per-request samples"""
+    origin = urlsplit(base_url)
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration if duration else None
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        samples = []
+        conn = http.client.HTTPConnection(origin.hostname, origin.port or 80, timeout=30)
+        while True:
+            n = next(counter)
+            if total and n >= total:
+                break
+            if deadline and time.perf_counter() >= deadline:
+                break
+            path = urls[n % len(urls)]
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                status, body = 0, b''
+            samples.append((path, status, len(body), time.perf_counter() - start))
+        conn.close()
+        with lock:
+            results.extend(samples)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(samples, elapsed, args, url_count):
+    latencies = sorted(sample[3] for sample in samples)
+    errors = sum(1 for sample in samples if sample[1] == 0 or sample[1] >= 400)
+    total_bytes = sum(sample[2] for sample in samples)
+    statuses = {}
+    per_path = {}
+    for path, status, _, latency in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        per_path.setdefault(path, []).append(latency)
+
+    slowest = sorted(per_path.items(), key=lambda item: -sum(item[1]) / len(item[1]))[:10]
+    return {
+        'base_url': args.base_url,
+        'urls': url_count,
+        'concurrency': args.concurrency,
+        'requests': len(samples),
+        'elapsed_seconds': round(elapsed, 3),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 5) if samples else 0.0,
+        'bytes': total_bytes,
+        'bytes_per_second': round(total_bytes / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            **{f'p{pct}': round(percentile(latencies, pct) * 1000, 3) for pct in PERCENTILES},
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        'status_codes': dict(sorted(statuses.items())),
+        'slowest_paths_ms': {
+            path: round(sum(values) / len(values) * 1000, 3) for path, values in slowest
+        },
+    }
+
+
+def print_summary(summary):
+    latency = summary['latency_ms']
+    print(f"Requests:    {summary['requests']} in {summary['elapsed_seconds']:.2f} s "
+          f"({summary['rps']:.1f} req/s, {summary['urls']} URLs, concurrency {summary['concurrency']})")
+    print(f"Errors:      {summary['errors']} ({summary['error_rate']:.2%})")
+    print(f"Throughput:  {summary['bytes_per_second'] / 1048576:.2f} MB/s "
+          f"({summary['bytes'] / 1048576:.1f} MB total)")
+    print("Latency:     " + "  ".join(f"p{pct} {latency[f'p{pct}']:.2f} ms" for pct in PERCENTILES)
+          + f"  max {latency['max']:.2f} ms")
+    print("Status:      " + ", ".join(f"{code}: {count}" for code, count in summary['status_codes'].items()))
+    print("Slowest paths (mean):")
+    for path, mean in summary['slowest_paths_ms'].items():
+        print(f"  {mean:8.2f} ms  {path}")
+
+
+def compare(before_path, after_path, threshold):
+    """Print a side-by-side diff of two runs; returns True if anything regressed"""
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)
+
+    # (label, getter, higher is better)
+    metrics = [
+        ('req/s', lambda r: r['rps'], True),
+        ('MB/s', lambda r: r['bytes_per_second'] / 1048576, True),
+        ('error rate %', lambda r: r['error_rate'] * 100, False),
+    ]
+    for pct in PERCENTILES:
+        metrics.append((f'p{pct} ms', lambda r, pct=pct: r['latency_ms'][f'p{pct}'], False))
+    metrics.append(('max ms', lambda r: r['latency_ms']['max'], False))
+
+    print(f"{'metric':<14} {'before':>12} {'after':>12} {'change':>9}")
+    regressed = False
+    for label, get, higher_is_better in metrics:
+        old, new = get(before), get(after)
+        if old:
+            change = (new - old) / old * 100
+        else:
+            change = 0.0 if not new else math.inf
+        worse = change < -threshold if higher_is_better else change > threshold
+        # Error rates regress on any increase from zero
+        if label.startswith('error') and new > old:
+            worse = True
+        marker = '  REGRESSION' if worse else ''
+        regressed = regressed or worse
+        print(f"{label:<14} {old:>12.2f} {new:>12.2f} {change:>+8.1f}%{marker}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test a running serve.py instance')
+    parser.add_argument('-b', '--base-url', default='http://localhost:8888',
+                        help='Server to test (default: http://localhost:8888)')
+    parser.add_argument('--urls', metavar='FILE', help='File with one path or URL per line')
+    parser.add_argument('--sitemap', metavar='FILE', help='Sitemap whose <loc> URLs are mapped onto --base-url')
+    parser.add_argument('--crawl', action='store_true', help='Crawl same-origin links from / on --base-url')
+    parser.add_argument('--max-urls', type=int, default=500, help='Crawl limit (default: 500)')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Concurrent connections (default: 8)')
+    parser.add_argument('-d', '--duration', type=float, default=10.0,
+                        help='Seconds to run (default: 10, ignored with --requests)')
+    parser.add_argument('-n', '--requests', type=int, default=0, help='Stop after this many requests')
+    parser.add_argument('-H', '--header', action='append', default=[], metavar='NAME:VALUE',
+                        help='Extra request header, e.g. "Accept-Encoding: gzip" (repeatable)')
+    parser.add_argument('-o', '--output', metavar='FILE', help='Save the run summary as JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Diff two saved runs instead of running a test')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Percent change flagged as a regression by --compare (default: {DEFAULT_THRESHOLD:g})')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    args.base_url = args.base_url.rstrip('/')
+
+    if args.urls:
+        urls = urls_from_file(args.urls)
+    elif args.sitemap:
+        urls = urls_from_sitemap(args.sitemap)
+    elif not args.crawl and os.path.isfile('sitemap.xml'):
+        urls = urls_from_sitemap('sitemap.xml')
+    else:
+        print(f"Crawling {args.base_url}/ ...")
+        urls = crawl(args.base_url, args.max_urls)
+    if not urls:
+        print("Error: no URLs to test")
+        sys.exit(1)
+
+    headers = {}
+    for header in args.header:
+        name, _, value = header.partition(':')
+        headers[name.strip()] = value.strip()
+
+    limit = f"{args.requests} requests" if args.requests else f"{args.duration:g} s"
+    print(f"Testing {args.base_url} with {len(urls)} URLs, concurrency {args.concurrency}, {limit}")
+    samples, elapsed = run_load(args.base_url, urls, args.concurrency,
+                                0 if args.requests else args.duration, args.requests, headers)
+    summary = summarize(samples, elapsed, args, len(urls))
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+            f.write('\n')
+        print(f"Saved: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Pack a built site into one file for `serve.py --pack`.
+The archive holds a JSON index (path, offset, length, content type, mtime,
+content hash and encoded variants) followed by every file body plus its
+gzip/brotli variants, so the server maps it once and never touches dist/.
+
+Usage: python3 scripts/pack-site.py [dist] [dist.pack]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from serve import PackedSite, write_pack  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack a built site for serve.py --pack')
+    parser.add_argument('directory', nargs='?', default='dist', help='Built site (default: dist)')
+    parser.add_argument('output', nargs='?', default='dist.pack', help='Archive to write (default: dist.pack)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory '{args.directory}' not found (run build.sh first)")
+        sys.exit(1)
+
+    count, size = write_pack(args.directory, args.output)
+    pack = PackedSite(args.output)
+    variants = sum(len(meta['variants']) for meta in pack.files.values())
+    print(f"Packed {count} files and {variants} encoded variants into {args.output} "
+          f"({size / 1048576:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Pre-render every HTML page once per language for `serve.py --i18n`.
+Applies the dictionaries in assets/js/translations.js the way
+TranslationEngine does in the browser (data-i18n text, placeholder, title,
+aria-label and alt), sets <html lang>, and swaps the translations.js script
+for the small lang-switch.js. Output goes to .i18n/<lang>/<page> inside the
+site, a hidden tree that Apache refuses to serve directly.
+
+Usage: python3 scripts/prerender-i18n.py [--translations FILE] [dist] [page.html ...]
+"""
+
+import argparse
+import html
+import os
+import re
+import sys
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from serve import I18N_DIR, I18N_LANGS, RouteTable  # noqa: E402
+
+TRANSLATIONS_JS = 'assets/js/translations.js'
+SWITCHER_JS = 'lang-switch.js'
+
+# data-i18n-* attribute -> attribute it fills in, as in TranslationEngine.translateElement
+I18N_ATTRIBUTES = {
+    'data-i18n-placeholder': 'placeholder',
+    'data-i18n-title': 'title',
+    'data-i18n-aria': 'aria-label',
+    'data-i18n-alt': 'alt',
+}
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'source', 'track', 'wbr',
+}
+
+# Elements whose end tag the minifier may drop; a sibling start tag closes them
+OPTIONAL_END = {'li', 'option', 'p', 'dt', 'dd', 'td', 'th', 'tr'}
+
+JS_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+
+
+def js_tokens(source):
+    """Strings, identifiers and punctuation of a JS object literal, comments skipped"""
+    i = 0
+    length = len(source)
+    while i < length:
+        char = source[i]
+        if char.isspace():
+            i += 1
+        elif source.startswith('//', i):
+            i = source.find('\n', i)
+            i = length if i < 0 else i
+        elif source.startswith('/*', i):
+            i = source.index('*/', i) + 2
+        elif char in '\'"':
+            value = []
+            i += 1
+            while source[i] != char:
+                if source[i] == '\\':
+                    escape = source[i + 1]
+                    if escape == 'u':
+                        value.append(chr(int(source[i + 2:i + 6], 16)))
+                        i += 6
+                        continue
+                    if escape == 'x':
+                        value.append(chr(int(source[i + 2:i + 4], 16)))
+                        i += 4
+                        continue
+                    if escape == '\n':
+                        i += 2
+                        continue
+                    value.append(JS_ESCAPES.get(escape, escape))
+                    i += 2
+                else:
+                    value.append(source[i])
+                    i += 1
+            i += 1
+            yield 'string', ''.join(value)
+        elif char.isalnum() or char in '_$':
+            start = i
+            while i < length and (source[i].isalnum() or source[i] in '_$'):
+                i += 1
+            yield 'name', source[start:i]
+        else:
+            i += 1
+            yield 'punct', char
+
+
+def parse_object(tokens):
+    """Nested object of string keys and string values; returns at the closing brace"""
+    result = {}
+    for kind, value in tokens:
+        if kind == 'punct' and value == '}':
+            return result
+        if kind in ('string', 'name'):
+            key = value
+            kind, value = next(tokens)
+            if value != ':':
+                raise ValueError(f'expected ":" after {key!r}')
+            kind, value = next(tokens)
+            if kind == 'punct' and value == '{':
+                result[key] = parse_object(tokens)
+            elif kind == 'string':
+                result[key] = value
+            else:
+                raise ValueError(f'unsupported value for {key!r}')
+    raise ValueError('unterminated object')
+
+
+def load_translations(path):
+    """The `translations` object from translations.js as {lang: {key: text}}"""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    start = source.index('{', source.index('const translations'))
+    tokens = js_tokens(source[start + 1:])
+    return parse_object(tokens)
+
+
+def set_attribute(tag_text, name, value):
+    """Start tag text with attribute `name` set to `value` (added if missing)"""
+    value = html.escape(value, quote=True)
+    pattern = re.compile(r'(\s' + re.escape(name) + r')(\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?(?=[\s/>])',
+                         re.IGNORECASE)
+    if pattern.search(tag_text):
+        return pattern.sub(lambda m: f'{m[1]}="{value}"', tag_text, count=1)
+    end = len(tag_text) - (2 if tag_text.endswith('/>') else 1)
+    return f'{tag_text[:end]} {name}="{value}"{tag_text[end:]}'
+
+
+class PageRenderer(HTMLParser):
+    """
+    Collects (start, end, text) edits against the original page source, so
+    everything that isn't translated is kept byte for byte
+    """
+
+    def __init__(self, source, lang, strings, fallback):
+        super().__init__(convert_charrefs=False)
+        self.source = source
+        self.lang = lang
+        self.strings = strings
+        self.fallback = fallback
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+        self.edits = []
+        # Element whose content is being replaced: [tag, content start, depth, text]
+        self.replacing = None
+
+    def position(self):
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def translate(self, key):
+        return self.strings.get(key) or self.fallback.get(key)
+
+    def render(self):
+        self.feed(self.source)
+        self.close()
+        if self.replacing is not None:
+            self.finish_replacement(len(self.source))
+        parts = []
+        position = 0
+        for start, end, text in sorted(self.edits):
+            parts.append(self.source[position:start])
+            parts.append(text)
+            position = end
+        parts.append(self.source[position:])
+        return ''.join(parts)
+
+    def finish_replacement(self, end):
+        _, start, _, text = self.replacing
+        self.edits.append((start, end, html.escape(text, quote=False)))
+        self.replacing = None
+
+    def handle_starttag(self, tag, attrs):
+        start = self.position()
+        if self.replacing is not None:
+            if self.replacing[2] == 0 and tag == self.replacing[0] and tag in OPTIONAL_END:
+                self.finish_replacement(start)
+            else:
+                if tag not in VOID_ELEMENTS:
+                    self.replacing[2] += 1
+                return
+        self.rewrite_tag(tag, dict(attrs), start, self.get_starttag_text())
+
+    def handle_startendtag(self, tag, attrs):
+        if self.replacing is None:
+            self.rewrite_tag(tag, dict(attrs), self.position(), self.get_starttag_text(), void=True)
+
+    def handle_endtag(self, tag):
+        if self.replacing is None:
+            return
+        if self.replacing[2] == 0:
+            self.finish_replacement(self.position())
+        else:
+            self.replacing[2] -= 1
+
+    def rewrite_tag(self, tag, attrs, start, tag_text, void=False):
+        new_text = tag_text
+        if tag == 'html':
+            new_text = set_attribute(new_text, 'lang', self.lang)
+        elif tag == 'script' and (attrs.get('src') or '').split('?')[0].endswith('translations.js'):
+            src = attrs['src']
+            new_text = new_text.replace(src, src.replace('translations.js', SWITCHER_JS), 1)
+
+        for source_attr, target_attr in I18N_ATTRIBUTES.items():
+            key = attrs.get(source_attr)
+            text = self.translate(key) if key else None
+            if text:
+                new_text = set_attribute(new_text, target_attr, text)
+
+        key = attrs.get('data-i18n')
+        text = self.translate(key) if key else None
+        if text:
+            if tag == 'input':
+                if (attrs.get('type') or '').lower() in ('submit', 'button'):
+                    new_text = set_attribute(new_text, 'value', text)
+            elif tag != 'textarea' and not void and tag not in VOID_ELEMENTS:
+                self.replacing = [tag, start + len(tag_text), 0, text]
+
+        if new_text != tag_text:
+            self.edits.append((start, start + len(tag_text), new_text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-render HTML pages per language for serve.py --i18n')
+    parser.add_argument('directory', nargs='?', default='dist', help='Built site (default: dist)')
+    parser.add_argument('pages', nargs='*', help='Only re-render these pages (paths inside the site)')
+    parser.add_argument('--translations', metavar='FILE',
+                        help=f'Dictionaries to apply (default: {TRANSLATIONS_JS} inside the site)')
+    args = parser.parse_args()
+
+    translations_path = args.translations or os.path.join(args.directory, TRANSLATIONS_JS)
+    if not os.path.isfile(translations_path):
+        print(f"Error: '{translations_path}' not found")
+        sys.exit(1)
+    translations = load_translations(translations_path)
+    fallback = translations['en']
+
+    pages = args.pages or sorted(rel for rel in RouteTable(args.directory).files.values()
+                                 if rel.endswith('.html'))
+    for lang in I18N_LANGS:
+        strings = translations.get(lang, {})
+        for rel in pages:
+            with open(os.path.join(args.directory, rel), encoding='utf-8') as f:
+                source = f.read()
+            rendered = PageRenderer(source, lang, strings, fallback).render()
+            output = os.path.join(args.directory, I18N_DIR, lang, rel)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(rendered)
+        print(f"  {lang}: {len(pages)} pages, {len(strings)} strings")
+    print(f"Pre-rendered into {os.path.join(args.directory, I18N_DIR)}/")
+
+
+if __name__ == '__main__':
+    main()
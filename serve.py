@@ -4,84 +4,3084 @@ Local Development Server with Clean URL Support
 Mimics Apache's mod_rewrite behavior for testing cPanel deployment locally
 """
 
+import asyncio
+import fnmatch
+import gc
+import gzip
+import hashlib
+import io
+import json
+import math
+import mmap
 import os
+import queue
+import re
+import secrets
+import shlex
+import signal
+import socket
+import struct
+import subprocess
 import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.cookies import CookieError, SimpleCookie
+from http.client import HTTPException
 from http.server import HTTPServer, SimpleHTTPRequestHandler
-from urllib.parse import urlparse, unquote
+from urllib.parse import parse_qsl, urlparse, unquote, quote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Worker threads in concurrent mode (0 = legacy single-threaded server)
+DEFAULT_WORKERS = 16
+
+# Seconds between checks of directory mtimes for added/removed files
+ROUTE_CHECK_INTERVAL = 1.0
+
+# Directories never walked into for the route table (still served on a miss)
+ROUTE_SKIP_DIRS = {'node_modules', '__pycache__'}
+
+# In-memory file cache budget in megabytes (0 disables the cache)
+DEFAULT_CACHE_MB = 64
+
+# Content types compressed on the fly (matches mod_deflate in .htaccess)
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/javascript', 'text/plain', 'text/xml',
+    'application/javascript', 'application/json', 'application/xml',
+    'application/manifest+json', 'image/svg+xml',
+}
+
+# Content-Encoding -> precompressed sidecar suffix, in server preference order
+SIDECAR_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Files at least this many kilobytes are sent with sendfile() (0 = never)
+DEFAULT_SENDFILE_KB = 512
+
+# Files served without the cache (--cache-size 0, or over its budget) are read
+# into memory per request below this size, streamed from disk from it on,
+# when --sendfile-threshold 0 gives no other cut-off
+UNCACHED_READ_LIMIT = DEFAULT_SENDFILE_KB * 1024
+
+# Chunk size for hashing large files and buffered body copies
+COPY_BUFSIZE = 64 * 1024
+
+# Ranges beyond this in one request are ignored and the full body is sent
+MAX_RANGES = 32
+
+# mod_expires interval units in seconds (a month is 30 days, a year 365)
+EXPIRES_UNITS = {
+    'year': 365 * 86400, 'month': 30 * 86400, 'week': 7 * 86400,
+    'day': 86400, 'hour': 3600, 'minute': 60, 'second': 1,
+}
+
+# Internal rewrite passes before giving up, like Apache's LimitInternalRecursion
+MAX_REWRITE_PASSES = 10
+
+# %{VAR} server variables, $N rule back-references and %N condition
+# back-references in RewriteRule substitutions and RewriteCond test strings
+REWRITE_EXPANSION = re.compile(r'%\{([A-Z_]+)\}|([$%])(\d)')
+# Any other %{...} form (%{HTTP:Header}, %{ENV:var}, ...) is not emulated
+REWRITE_UNSUPPORTED = re.compile(r'%\{(?![A-Z_]+\})[^}]*\}')
+
+# Latency samples kept per route class for percentiles
+METRICS_WINDOW = 4096
+
+# Built-in metrics endpoint (JSON, or Prometheus text with ?format=prometheus)
+METRICS_PATH = '/__metrics'
+
+# Route classes reported by /__metrics, in display order
+ROUTE_CLASSES = ('rewrite', 'static', 'data', 'proxy', '404', 'other')
+
+# A pre-fork worker exiting this soon after start aborts the whole server
+PREFORK_STARTUP_GRACE = 2.0
+
+# Seconds an idle keep-alive connection may hold a worker (Apache's default)
+KEEP_ALIVE_TIMEOUT = 5
+
+# Packed site snapshot: magic, big-endian index length, JSON index, bodies
+PACK_MAGIC = b'BSPACK\x00\x01'
+PACK_HEADER = struct.Struct('>8sQ')
+
+# --proxy: /proxy/<name>/<rest>?<query> -> upstream base + /<rest>?<query>,
+# cached for the TTL (seconds) and served stale for up to a day when the
+# upstream fails
+PROXY_PREFIX = '/proxy/'
+PROXY_UPSTREAMS = {
+    'weather': ('https://api.open-meteo.com/v1/forecast', 600),
+    'fx': ('https://open.er-api.com/v6/latest', 3600),
+}
+PROXY_STALE_MAX = 24 * 3600
+PROXY_TIMEOUT = 5
+PROXY_MAX_ENTRIES = 256
+PROXY_MAX_BODY = 1024 * 1024
+# Set on HTML responses so info-bar.js/weather-map.js know the proxy is there
+PROXY_COOKIE = 'bs_api_proxy=1; Path=/; Max-Age=600; SameSite=Lax'
+
+# --i18n: per-language pages pre-rendered by scripts/prerender-i18n.py live
+# under I18N_DIR/<lang>/; the language comes from the I18N_COOKIE cookie,
+# then Accept-Language, then the first entry here
+I18N_DIR = '.i18n'
+I18N_LANGS = ('en', 'fil', 'ilo')
+I18N_COOKIE = 'lang'
+# Accept-Language primary subtags -> site language
+I18N_ALIASES = {'en': 'en', 'fil': 'fil', 'tl': 'fil', 'ilo': 'ilo'}
+
+# Server engines selectable with --engine
+ENGINES = ('threads', 'asyncio')
+
+# asyncio engine: accept backlog, and the largest request head/body it reads
+ASYNC_BACKLOG = 1024
+MAX_REQUEST_HEAD = 64 * 1024
+MAX_REQUEST_BODY = 1024 * 1024
+CONTENT_LENGTH_RE = re.compile(rb'\r\ncontent-length:[ \t]*(\d+)', re.IGNORECASE)
+
+# --profile: link emulated on every connection, in kbit/s and milliseconds.
+# The 3G rows are Chrome DevTools' presets, 4g is WebPageTest's
+NetworkProfile = namedtuple('NetworkProfile', 'down_kbps up_kbps rtt_ms')
+NETWORK_PROFILES = {
+    'slow-3g': NetworkProfile(400, 400, 2000),
+    'fast-3g': NetworkProfile(1440, 675, 562.5),
+    '4g': NetworkProfile(9000, 9000, 170),
+}
+# Bytes released per pacing step; ~80 ms of slow-3g, so transfers stay smooth
+SHAPED_CHUNK = 4096
+
+# Server-Timing phases, in header order, with the label devtools shows.
+# Send time can't precede the body it measures; it is the HAR's "receive"
+SERVER_TIMING_PHASES = {
+    'route': 'Route resolution',
+    'cache': 'Cache lookup',
+    'compress': 'Compression',
+    'total': 'Time to headers',
+}
+
+# --har: entries kept for the session file (oldest dropped beyond this)
+HAR_MAX_ENTRIES = 50000
+
+# Source files a build leaves out of dist/ (fnmatch patterns on any path
+# component), shared by scripts/build.py and --watch
+BUILD_EXCLUDES = (
+    'node_modules', 'dist', 'dist.pack', '.git', '.vscode', '.DS_Store', 'react-app',
+    'backup-restore-point-*', 'package*.json', 'build.sh', 'babel.config.json', 'serve.py',
+    'scripts', 'docs', '*.backup', '*.md', '.lighthouserc.json', '.github', '.gitignore',
+    'validate-translations.js', '__pycache__', '.build-cache', I18N_DIR,
+)
+
+# --watch: the source tree is polled every WATCH_INTERVAL seconds and changed
+# files are copied into the served directory, skipping BUILD_EXCLUDES; open
+# pages reload over Server-Sent Events from LIVE_RELOAD_PATH
+WATCH_INTERVAL = 0.3
+LIVE_RELOAD_PATH = '/__livereload'
+# Comment line sent on idle streams so proxies and browsers keep them open
+LIVE_RELOAD_HEARTBEAT = 15
+# Injected before </body> of every page while watching: drop the changed
+# files from the service worker's caches, then reload
+LIVE_RELOAD_SNIPPET = (
+    b'<script>new EventSource("' + LIVE_RELOAD_PATH.encode() + b'").addEventListener("reload",'
+    b'function(e){var p=JSON.parse(e.data);(window.caches?caches.keys().then(function(k){'
+    b'return Promise.all(k.map(function(n){return caches.open(n).then(function(c){'
+    b'return Promise.all(p.map(function(u){return c.delete(u)}))})}))}):Promise.resolve())'
+    b'.then(function(){location.reload()})})</script>'
+)
+LIVE_RELOAD_HEAD = (b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                    b'Cache-Control: no-cache\r\nConnection: close\r\n\r\n')
+
+# --rum: web-vitals beacons POSTed to RUM_PATH by main.js (only on pages
+# carrying RUM_COOKIE), summarised per page, language and metric
+RUM_PATH = '/__rum'
+RUM_COOKIE = 'bs_rum=1; Path=/; Max-Age=600; SameSite=Lax'
+# Metric -> largest plausible value (ms, CLS unitless); others are dropped
+RUM_METRICS = {'LCP': 120000, 'INP': 60000, 'CLS': 100, 'TTFB': 120000}
+RUM_MAX_BODY = 16 * 1024
+# Percentile sketches: relative accuracy, and values treated as zero
+RUM_SKETCH_ACCURACY = 0.01
+RUM_SKETCH_MIN = 1e-4
+RUM_PERCENTILES = (50, 75, 95, 99)
+# Seconds between appends of the interval sketches to the --rum file
+RUM_FLUSH_INTERVAL = 60
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
+
+def parse_expires(value):
+    """
+    Parse a mod_expires interval ("access plus 1 month 2 days" or "A2592000")
+    Returns (base, seconds) with base 'access' or 'modification', or None
+    """
+    value = value.strip()
+    if re.fullmatch(r'[AM]\d+', value):
+        return ('access' if value[0] == 'A' else 'modification'), int(value[1:])
+
+    words = value.lower().split()
+    if len(words) < 4 or words[1] != 'plus' or len(words) % 2:
+        return None
+    base = {'access': 'access', 'now': 'access', 'modification': 'modification'}.get(words[0])
+    if base is None:
+        return None
+    seconds = 0
+    for amount, unit in zip(words[2::2], words[3::2]):
+        unit = unit.rstrip('s')
+        if not amount.isdigit() or unit not in EXPIRES_UNITS:
+            return None
+        seconds += int(amount) * EXPIRES_UNITS[unit]
+    return base, seconds
+
+def parse_rewrite_flags(words):
+    """'[NC,L,R=301]' -> {'NC': True, 'L': True, 'R': '301'}"""
+    flags = {}
+    for word in words:
+        for flag in word.strip('[]').split(','):
+            name, _, value = flag.partition('=')
+            if name:
+                flags[name.strip().upper()] = value.strip() or True
+    return flags
+
+class RewriteCond:
+    """A compiled RewriteCond: test string, then a regex, file test or string match"""
+
+    __slots__ = ('test_string', 'negate', 'kind', 'pattern', 'ornext')
+
+    def __init__(self, test_string, cond_pattern, flags):
+        self.test_string = test_string
+        self.negate = cond_pattern.startswith('!')
+        if self.negate:
+            cond_pattern = cond_pattern[1:]
+        self.ornext = 'OR' in flags
+        if cond_pattern in ('-f', '-s', '-d', '-l', '-F', '-U'):
+            self.kind = cond_pattern
+            self.pattern = None
+        elif cond_pattern.startswith('='):
+            self.kind = '='
+            self.pattern = cond_pattern[1:]
+        else:
+            self.kind = 're'
+            self.pattern = re.compile(cond_pattern, re.IGNORECASE if 'NC' in flags else 0)
+
+class RewriteRule:
+    """A compiled RewriteRule with the RewriteConds that guard it"""
+
+    __slots__ = ('pattern', 'substitution', 'flags', 'conditions')
+
+    def __init__(self, pattern, substitution, flags, conditions):
+        self.pattern = re.compile(pattern, re.IGNORECASE if 'NC' in flags else 0)
+        self.substitution = substitution
+        self.flags = flags
+        self.conditions = conditions
+
+class Htaccess:
+    """
+    The parts of .htaccess that shape responses, parsed once at startup
+    Covers mod_expires, `Header set` and Allow/Deny inside <FilesMatch>,
+    mod_rewrite rules (compiled into ordered matchers), ErrorDocument and
+    Options -Indexes
+    <IfModule> sections are treated as enabled, as on the cPanel host
+    """
+
+    def __init__(self, path=None, text=None):
+        self.path = path
+        self.expires_active = False
+        self.expires_default = None
+        self.expires_by_type = {}
+        # (compiled filename regex, [(header, value), ...]) in file order
+        self.files_match = []
+        # (compiled filename regex, allow?) from Allow/Deny inside <FilesMatch>
+        self.access_rules = []
+        self.access_cache = {}
+        self.rewrite_engine = False
+        self.rewrite_base = '/'
+        self.rewrite_rules = []
+        # RewriteRule lines dropped because they or their RewriteConds use
+        # variables the emulation can't evaluate (see REWRITE_UNSUPPORTED)
+        self.unsupported_rules = []
+        # status code -> local URL path of the error page
+        self.error_documents = {}
+        self.indexes = True
+        if path is not None:
+            self.parse(path, text)
+
+    def parse(self, path, text=None):
+        if text is None:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        current_match = None
+        pending_conds = []
+        unsupported = False
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                words = shlex.split(line)
+            except ValueError:
+                continue
+            if not words:
+                continue
+            directive = words[0].lower()
+
+            if directive == '<filesmatch' and len(words) > 1:
+                pattern = words[1].rstrip('>')
+                try:
+                    current_match = (re.compile(pattern), [])
+                except re.error:
+                    current_match = None
+                if current_match is not None:
+                    self.files_match.append(current_match)
+            elif directive == '</filesmatch>':
+                current_match = None
+            elif directive in ('allow', 'deny') and current_match is not None and words[1:] == ['from', 'all']:
+                self.access_rules.append((current_match[0], directive == 'allow'))
+            elif directive == 'rewriteengine' and len(words) > 1:
+                self.rewrite_engine = words[1].lower() == 'on'
+            elif directive == 'rewritebase' and len(words) > 1:
+                self.rewrite_base = words[1].rstrip('/') + '/'
+            elif directive == 'rewritecond' and len(words) > 2:
+                if REWRITE_UNSUPPORTED.search(words[1]):
+                    unsupported = True
+                    continue
+                try:
+                    pending_conds.append(RewriteCond(words[1], words[2], parse_rewrite_flags(words[3:])))
+                except re.error:
+                    pass
+            elif directive == 'rewriterule' and len(words) > 2:
+                # Rejected rather than run with the variable left unexpanded
+                if unsupported or REWRITE_UNSUPPORTED.search(words[2]):
+                    self.unsupported_rules.append(line)
+                else:
+                    try:
+                        self.rewrite_rules.append(RewriteRule(
+                            words[1], words[2], parse_rewrite_flags(words[3:]), pending_conds))
+                    except re.error:
+                        pass
+                pending_conds = []
+                unsupported = False
+            elif directive == 'errordocument' and len(words) > 2 and words[1].isdigit():
+                # Only local documents; external URLs would be redirects
+                if words[2].startswith('/'):
+                    self.error_documents[int(words[1])] = words[2]
+            elif directive == 'options':
+                for option in words[1:]:
+                    if option.lower() == '-indexes':
+                        self.indexes = False
+                    elif option.lower() in ('+indexes', 'indexes'):
+                        self.indexes = True
+            elif directive == 'expiresactive' and len(words) > 1:
+                self.expires_active = words[1].lower() == 'on'
+            elif directive == 'expiresdefault' and len(words) > 1:
+                self.expires_default = parse_expires(words[1])
+            elif directive == 'expiresbytype' and len(words) > 2:
+                rule = parse_expires(words[2])
+                if rule is not None:
+                    self.expires_by_type[words[1].lower()] = rule
+            elif (directive == 'header' and current_match is not None
+                  and len(words) > 3 and words[1].lower() == 'set'):
+                current_match[1].append((words[2], words[3]))
+
+    def expires_for(self, content_type):
+        """(base, seconds) mod_expires rule for a content type, or None"""
+        if not self.expires_active:
+            return None
+        mime = content_type.split(';')[0].strip().lower()
+        return self.expires_by_type.get(mime, self.expires_default)
+
+    def allows(self, filename):
+        """Allow/Deny from <FilesMatch> blocks; the last matching block wins"""
+        allowed = self.access_cache.get(filename)
+        if allowed is None:
+            allowed = True
+            for pattern, allow in self.access_rules:
+                if pattern.search(filename):
+                    allowed = allow
+            self.access_cache[filename] = allowed
+        return allowed
+
+    def rewrite(self, path, query, env, routes):
+        """
+        Run the compiled RewriteRules for a decoded request path
+        env supplies server variables (THE_REQUEST, HTTP_HOST, ...); file
+        tests (-f, -d) are answered from the route table, not the disk
+        Returns ('redirect', status, location), ('forbidden',), ('gone',)
+        or ('path', path, query) for the (possibly rewritten) request
+        """
+        if not self.rewrite_engine or not self.rewrite_rules:
+            return ('path', path, query)
+
+        for _ in range(MAX_REWRITE_PASSES):
+            outcome = self.rewrite_pass(path, query, env, routes)
+            if outcome[0] != 'path' or (outcome[1], outcome[2]) == (path, query):
+                return outcome
+            # Per-directory rewrites are re-injected until they settle
+            path, query = outcome[1], outcome[2]
+        return ('path', path, query)
+
+    def rewrite_pass(self, path, query, env, routes):
+        base = self.rewrite_base
+        for rule in self.rewrite_rules:
+            # In .htaccess context rules see the path without the RewriteBase
+            local_path = path[len(base):] if path.startswith(base) else path.lstrip('/')
+            match = rule.pattern.search(local_path)
+            if match is None:
+                continue
+            cond_match = self.check_conditions(rule, path, query, env, routes, match)
+            if cond_match is False:
+                continue
+
+            flags = rule.flags
+            if 'F' in flags:
+                return ('forbidden',)
+            if 'G' in flags:
+                return ('gone',)
+            if rule.substitution == '-':
+                if 'L' in flags:
+                    break
+                continue
+
+            target = self.expand(rule.substitution, env, path, query, match, cond_match)
+            new_query = query
+            if '?' in target:
+                target, _, new_query = target.partition('?')
+                if 'QSA' in flags and query:
+                    new_query = new_query + '&' + query if new_query else query
+            if not re.match(r'[a-z][a-z0-9+.-]*://', target, re.IGNORECASE) and not target.startswith('/'):
+                target = base + target
+
+            if 'R' in flags:
+                status = int(flags['R']) if flags['R'] is not True else 302
+                location = target if '://' in target else quote(target)
+                if new_query:
+                    location += '?' + new_query
+                return ('redirect', status, location)
+
+            path, query = target, new_query
+            if 'L' in flags:
+                break
+        return ('path', path, query)
+
+    def check_conditions(self, rule, path, query, env, routes, rule_match):
+        """
+        Evaluate a rule's RewriteConds (ANDed, except runs joined by [OR])
+        Returns False if they fail, else the last RewriteCond regex match (or None)
+        """
+        last_match = None
+        group_ok = False
+        for cond in rule.conditions:
+            if not group_ok:
+                value = self.expand(cond.test_string, env, path, query, rule_match, last_match)
+                if cond.kind == 're':
+                    match = cond.pattern.search(value)
+                    result = match is not None
+                    if result and not cond.negate:
+                        last_match = match
+                elif cond.kind == '=':
+                    result = value == cond.pattern
+                elif cond.kind in ('-f', '-s', '-F'):
+                    result = routes.is_file(value)
+                elif cond.kind == '-d':
+                    result = routes.is_dir(value)
+                else:
+                    result = False
+                group_ok = result != cond.negate
+            if not cond.ornext:
+                if not group_ok:
+                    return False
+                group_ok = False
+        return last_match
+
+    def expand(self, template, env, path, query, rule_match, cond_match):
+        """Expand %{VAR}, $N (rule groups) and %N (last RewriteCond groups)"""
+        def variable(match):
+            name = match.group(1)
+            # Filenames are URL paths here; file tests go to the route table
+            if name in ('REQUEST_URI', 'REQUEST_FILENAME'):
+                return path
+            if name == 'QUERY_STRING':
+                return query
+            return env.get(name, '')
+
+        def backref(match):
+            source = rule_match if match.group(2) == '$' else cond_match
+            index = int(match.group(3))
+            if source is None or index > source.re.groups:
+                return ''
+            return source.group(index) or ''
+
+        def expansion(match):
+            return variable(match) if match.group(1) is not None else backref(match)
+
+        # One pass, so a %N inside an expanded value (say a percent-encoded
+        # THE_REQUEST) is never taken for a back-reference
+        return REWRITE_EXPANSION.sub(expansion, template)
+
+    def file_headers(self, filename):
+        """Headers set by matching <FilesMatch> blocks; later blocks win, as in Apache"""
+        headers = {}
+        for pattern, block_headers in self.files_match:
+            if pattern.search(filename):
+                for name, value in block_headers:
+                    headers[name] = value
+        return list(headers.items())
+
+class RouteTable:
+    """
+    In-memory map from request path to file, built by walking the served
+    directory once so that clean-URL resolution is a single dict lookup
+    Mirrors the .htaccess rules: real files first, then directory index.html,
+    then the .html file for an extensionless clean URL
+    """
+
+    def __init__(self, root='.', check_interval=ROUTE_CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        self.routes = {}
+        self.files = {}
+        self.dirs = set()
+        # Pre-rendered language variants under I18N_DIR (not routable themselves)
+        self.language_files = set()
+        self.dir_mtimes = {}
+        self.next_check = 0.0
+        self.lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        """Walk the served tree and swap in a fresh route table"""
+        files = {}
+        dirs = set()
+        dir_mtimes = {}
+
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames
+                           if not d.startswith('.') and d not in ROUTE_SKIP_DIRS]
+            dir_mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, '/')
+            prefix = '/' if rel_dir == '.' else '/' + rel_dir + '/'
+            dirs.add(prefix)
+            for name in filenames:
+                rel_path = (prefix + name).lstrip('/')
+                files['/' + rel_path] = rel_path
+
+        language_files = set()
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, I18N_DIR)):
+            dir_mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, '/')
+            # .br/.gz sidecars are found next to their page, not looked up
+            language_files.update(rel_dir + '/' + name for name in filenames
+                                  if not name.endswith(tuple(SIDECAR_SUFFIXES.values())))
+
+        self.index(files, dirs)
+        self.language_files = language_files
+        self.dir_mtimes = dir_mtimes
+
+    def index(self, files, dirs):
+        """Derive clean-URL and directory-index routes from the file list"""
+        routes = dict(files)
+        for url, target in files.items():
+            # /services/certificates -> services/certificates.html
+            if url.endswith('.html'):
+                clean = url[:-len('.html')]
+                if clean and clean not in files and clean + '/' not in dirs:
+                    routes[clean] = target
+        for prefix in dirs:
+            # /services/ and /services -> services/index.html
+            index = prefix + 'index.html'
+            if index in files:
+                routes[prefix] = files[index]
+                if prefix != '/':
+                    routes[prefix.rstrip('/')] = files[index]
+
+        self.routes = routes
+        self.files = files
+        self.dirs = dirs
+
+    def maybe_refresh(self):
+        """Rebuild if any directory changed since the last check (throttled)"""
+        now = time.monotonic()
+        if now < self.next_check or not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.next_check = now + self.check_interval
+            for dirpath, mtime in self.dir_mtimes.items():
+                try:
+                    changed = os.stat(dirpath).st_mtime_ns != mtime
+                except OSError:
+                    changed = True
+                if changed:
+                    self.rebuild()
+                    return
+        finally:
+            self.lock.release()
+
+    def lookup(self, path):
+        """Return the file path (relative to root) for a request path, or None"""
+        return self.routes.get(path)
+
+    def language_variant(self, target, lang):
+        """Pre-rendered copy of target in lang, or None"""
+        variant = f'{I18N_DIR}/{lang}/{target}'
+        return variant if variant in self.language_files else None
+
+    def is_file(self, path):
+        """mod_rewrite -f, answered from the walk instead of a stat()"""
+        return path in self.files
+
+    def is_dir(self, path):
+        """mod_rewrite -d, answered from the walk instead of a stat()"""
+        return (path.rstrip('/') + '/') in self.dirs
+
+class ErrorPages:
+    """
+    ErrorDocument bodies held in memory, reloaded only when the page changes
+    """
+
+    def __init__(self, error_documents, routes, pack=None):
+        self.error_documents = error_documents
+        self.routes = routes
+        self.pack = pack
+        # status code -> (target, mtime_ns, body)
+        self.pages = {}
+        self.lock = threading.Lock()
+        for code in error_documents:
+            self.get(code)
+
+    def get(self, code):
+        """(file path, body) of the error page for a status code, or None"""
+        url = self.error_documents.get(code)
+        if url is None:
+            return None
+        target = self.routes.lookup(url)
+        if target is None:
+            return None
+        if self.pack is not None:
+            return target, self.pack.body(target)
+        try:
+            mtime_ns = os.stat(target).st_mtime_ns
+        except OSError:
+            return None
+
+        page = self.pages.get(code)
+        if page is not None and page[0] == target and page[1] == mtime_ns:
+            return target, page[2]
+        try:
+            with open(target, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        with self.lock:
+            self.pages[code] = (target, mtime_ns, body)
+        return target, body
+
+def compress_body(body, encoding):
+    """Compress body at maximum level, or None if the encoding isn't available"""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+def read_sidecar(path, encoding, mtime_ns):
+    """Read a precompressed .br/.gz file next to path unless it is older than path"""
+    sidecar = path + SIDECAR_SUFFIXES[encoding]
+    try:
+        if os.stat(sidecar).st_mtime_ns < mtime_ns:
+            return None
+        with open(sidecar, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def parse_accept_encoding(header):
+    """Map each item in an Accept-Encoding (or Accept-Language) header to its q-value"""
+    prefs = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        prefs[coding] = q
+    return prefs
+
+def parse_byte_ranges(header, size):
+    """
+    Parse a Range header against a body of `size` bytes
+    Returns None if the header should be ignored (malformed, not bytes, too
+    many ranges), [] if nothing is satisfiable, or sorted, merged inclusive
+    (start, end) pairs
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for item in spec.split(','):
+        first, dash, last = item.strip().partition('-')
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if start < 0 or end < start:
+                    return None
+            else:
+                # Suffix range: the final N bytes
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def multipart_byteranges(entry, ranges, boundary):
+    """Build a multipart/byteranges payload for a 206 response"""
+    parts = []
+    for start, end in ranges:
+        parts.append(
+            f'--{boundary}\r\n'
+            f'Content-Type: {entry.content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{entry.size}\r\n\r\n'.encode('latin-1'))
+        parts.append(entry.read(start, end + 1 - start))
+        parts.append(b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('latin-1'))
+    return b''.join(parts)
+
+def hash_file(path):
+    """Content ETag for a file too large to keep in memory"""
+    digest = hashlib.blake2b(digest_size=12)
+    with open(path, 'rb') as f:
+        while chunk := f.read(COPY_BUFSIZE):
+            digest.update(chunk)
+    return '"' + digest.hexdigest() + '"'
+
+class CacheEntry:
+    """
+    A cached file body with its validators, headers and encoded variants
+    Large files keep body=None and are sent from disk with sendfile()
+    """
+
+    __slots__ = ('path', 'mtime_ns', 'size', 'mtime', 'body', 'headers',
+                 'content_type', 'cache_control', 'etag', 'variants', 'nbytes')
+
+    def __init__(self, path, stat, body, headers, etag=None):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.body = body
+        self.headers = headers
+        self.content_type = dict(headers).get('Content-Type', '')
+        # Cache-Control set explicitly by .htaccess <FilesMatch>, if any
+        self.cache_control = dict(headers).get('Cache-Control')
+        # Strong validator from the content itself, so touch-only rebuilds
+        # still revalidate with 304s
+        if etag is None:
+            etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.etag = etag
+        # Content-Encoding -> compressed body (None when it doesn't pay off)
+        self.variants = {}
+        self.nbytes = 0 if body is None else self.size
+
+    @property
+    def compressible(self):
+        return self.content_type.split(';')[0] in COMPRESSIBLE_TYPES
+
+    def etag_for(self, encoding):
+        """Each Content-Encoding is a different representation with its own strong ETag"""
+        if encoding is None:
+            return self.etag
+        return self.etag[:-1] + '-' + encoding + '"'
+
+    def read(self, start=0, length=None):
+        """Bytes of the identity body, from memory or straight from disk"""
+        if length is None:
+            length = self.size - start
+        if self.body is not None:
+            return self.body[start:start + length]
+        with open(self.path, 'rb') as f:
+            return os.pread(f.fileno(), length, start)
+
+def load_entry(path, stat, header_factory, sendfile_threshold=0):
+    """
+    CacheEntry for path with the body read into memory, or only its metadata
+    for a file of at least sendfile_threshold bytes; None if the file can't
+    be read or changed while reading
+    """
+    if sendfile_threshold and stat.st_size >= sendfile_threshold:
+        try:
+            etag = hash_file(path)
+        except OSError:
+            return None
+        return CacheEntry(path, stat, None, header_factory(path, stat), etag)
+    try:
+        with open(path, 'rb') as f:
+            body = f.read()
+    except OSError:
+        return None
+    if len(body) != stat.st_size:
+        return None
+    return CacheEntry(path, stat, body, header_factory(path, stat))
+
+def encode_entry(entry, encoding, compress=True):
+    """
+    entry's body in the given Content-Encoding: its .br/.gz sidecar file,
+    else compressed now (if compress); None when the encoding is unavailable
+    or doesn't shrink the body
+    """
+    body = read_sidecar(entry.path, encoding, entry.mtime_ns)
+    if body is None and compress:
+        try:
+            body = compress_body(entry.read(), encoding)
+        except OSError:
+            body = None
+    if body is not None and len(body) >= entry.size:
+        body = None
+    return body
+
+class FileCache:
+    """
+    Byte-bounded LRU cache of file contents and response headers
+    Entries are revalidated with one stat() per request and dropped as soon
+    as the file's mtime or size changes
+    """
+
+    def __init__(self, max_bytes, sendfile_threshold=0):
+        self.max_bytes = max_bytes
+        self.sendfile_threshold = sendfile_threshold
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        # (entry, encoding) -> Event set once its first compression is stored
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def get(self, path, header_factory):
+        """
+        Return a fresh CacheEntry for path, or None if it can't be cached
+        header_factory(path, stat) builds the headers stored with a new entry
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Large files keep only metadata (and compressed variants) in memory
+        is_large = self.sendfile_threshold and stat.st_size >= self.sendfile_threshold
+        if not is_large and stat.st_size > self.max_bytes:
+            return None
+        entry = load_entry(path, stat, header_factory, self.sendfile_threshold)
+        if entry is None:
+            # Unreadable, or changed while reading; served uncached this time
+            return None
+
+        with self.lock:
+            self.discard(path)
+            self.entries[path] = entry
+            self.current_bytes += entry.nbytes
+            self.evict()
+        return entry
+
+    def preload(self, paths, header_factory):
+        """Load files up front, stopping before anything would be evicted"""
+        for path in paths:
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                continue
+            is_large = self.sendfile_threshold and size >= self.sendfile_threshold
+            if not is_large and self.current_bytes + size > self.max_bytes:
+                continue
+            self.get(path, header_factory)
+        return len(self.entries), self.current_bytes
+
+    def variant(self, entry, encoding):
+        """
+        Return entry's body in the given Content-Encoding, preferring a
+        .br/.gz sidecar file and otherwise compressing once and keeping it
+        Returns None when the encoding is unavailable or doesn't shrink the body
+        Concurrent first requests share one compression (single-flight)
+        """
+        if encoding in entry.variants:
+            return entry.variants[encoding]
+
+        key = (entry, encoding)
+        with self.lock:
+            if encoding in entry.variants:
+                return entry.variants[encoding]
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = threading.Event()
+
+        if not leader:
+            flight.wait()
+            return entry.variants.get(encoding)
+
+        try:
+            body = encode_entry(entry, encoding)
+            with self.lock:
+                entry.variants[encoding] = body
+                if body is not None and self.entries.get(entry.path) is entry:
+                    entry.nbytes += len(body)
+                    self.current_bytes += len(body)
+                    self.evict()
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.set()
+        return body
+
+    def evict(self):
+        """Drop least recently used entries until within budget (caller holds the lock)"""
+        while self.current_bytes > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+            self.evictions += 1
+            self.evicted_bytes += evicted.nbytes
+
+    def discard(self, path):
+        """Drop a stale entry (caller holds the lock)"""
+        stale = self.entries.pop(path, None)
+        if stale is not None:
+            self.current_bytes -= stale.nbytes
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hit_ratio(), 4),
+            'evictions': self.evictions,
+            'evicted_bytes': self.evicted_bytes,
+        }
+
+# The parts of os.stat_result that CacheEntry and header factories read
+PackStat = namedtuple('PackStat', 'st_size st_mtime st_mtime_ns')
+
+def write_pack(directory, output):
+    """
+    Pack every servable file under directory into one archive: a JSON index
+    (path, offset, length, content type, mtime, content hash and encoded
+    variants) followed by the bodies
+    .br/.gz sidecars become variants of their file; other compressible files
+    are compressed here. Returns (files, bytes written)
+    """
+    tree = RouteTable(directory)
+    files = tree.files
+    sidecars = {rel + suffix for rel in files.values() for suffix in SIDECAR_SUFFIXES.values()}
+    bodies = []
+    index = {}
+    offset = 0
+
+    def add(body):
+        nonlocal offset
+        bodies.append(body)
+        offset += len(body)
+        return [offset - len(body), len(body)]
+
+    for rel in sorted(files.values()) + sorted(tree.language_files):
+        if rel in sidecars:
+            continue
+        path = os.path.join(directory, rel)
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = CleanURLHandler.content_type(rel)
+        start, length = add(body)
+        meta = {
+            'offset': start,
+            'length': length,
+            'type': content_type,
+            'mtime': stat.st_mtime,
+            'etag': '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"',
+            'variants': {},
+        }
+        if content_type.split(';')[0] in COMPRESSIBLE_TYPES:
+            for encoding in SIDECAR_SUFFIXES:
+                encoded = read_sidecar(path, encoding, stat.st_mtime_ns)
+                if encoded is None:
+                    encoded = compress_body(body, encoding)
+                if encoded is not None and len(encoded) < len(body):
+                    meta['variants'][encoding] = add(encoded)
+        index[rel] = meta
+
+    # Offsets in the index are relative to the end of the header
+    header = json.dumps({'files': index, 'dirs': sorted(tree.dirs)},
+                        separators=(',', ':')).encode('utf-8')
+    with open(output + '.tmp', 'wb') as f:
+        f.write(PACK_HEADER.pack(PACK_MAGIC, len(header)))
+        f.write(header)
+        for body in bodies:
+            f.write(body)
+    os.replace(output + '.tmp', output)
+    return len(index), PACK_HEADER.size + len(header) + offset
+
+class PackedSite:
+    """
+    A site snapshot written by write_pack, mapped read-only in one mmap
+    Bodies are memoryviews into the mapping: no per-file open() or stat(),
+    and forked workers share the same page-cache pages
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, header_length = PACK_HEADER.unpack_from(self.map)
+        if magic != PACK_MAGIC:
+            raise ValueError(f'{path} is not a site pack')
+        self.data_start = PACK_HEADER.size + header_length
+        header = json.loads(self.view[PACK_HEADER.size:self.data_start].tobytes())
+        self.files = header['files']
+        self.dirs = set(header['dirs'])
+        self.size = len(self.map)
+
+    def slice(self, offset, length):
+        start = self.data_start + offset
+        return self.view[start:start + length]
+
+    def body(self, rel):
+        meta = self.files[rel]
+        return self.slice(meta['offset'], meta['length'])
+
+    def variants(self, rel):
+        """Content-Encoding -> body for each encoded variant in the pack"""
+        return {encoding: self.slice(*span)
+                for encoding, span in self.files[rel]['variants'].items()}
+
+    def text(self, rel):
+        return self.body(rel).tobytes().decode('utf-8')
+
+class PackRouteTable(RouteTable):
+    """RouteTable over a PackedSite's index; the snapshot never changes"""
+
+    def __init__(self, pack):
+        self.pack = pack
+        super().__init__(root=pack.path)
+
+    def rebuild(self):
+        prefix = I18N_DIR + '/'
+        self.index({'/' + rel: rel for rel in self.pack.files if not rel.startswith(prefix)},
+                   self.pack.dirs)
+        self.language_files = {rel for rel in self.pack.files if rel.startswith(prefix)}
+
+    def maybe_refresh(self):
+        pass
+
+class PackCache:
+    """
+    FileCache stand-in serving every entry straight from a PackedSite
+    Entries are built on first use and never revalidated or evicted
+    """
+
+    def __init__(self, pack):
+        self.pack = pack
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, header_factory):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        meta = self.pack.files.get(path)
+        if meta is None:
+            return None
+        mtime = meta['mtime']
+        stat = PackStat(meta['length'], mtime, int(mtime * 1e9))
+        entry = CacheEntry(path, stat, self.pack.body(path), header_factory(path, stat), meta['etag'])
+        # Only encodings in the pack exist; absent ones read as "doesn't pay off"
+        entry.variants = dict.fromkeys(SIDECAR_SUFFIXES)
+        entry.variants.update(self.pack.variants(path))
+        entry.nbytes = 0
+        with self.lock:
+            entry = self.entries.setdefault(path, entry)
+        return entry
+
+    def preload(self, paths, header_factory):
+        for path in paths:
+            self.get(path, header_factory)
+        return len(self.entries), 0
+
+    def variant(self, entry, encoding):
+        return entry.variants.get(encoding)
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.pack.size,
+            'max_bytes': self.pack.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hit_ratio(), 4),
+            'evictions': 0,
+            'evicted_bytes': 0,
+        }
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[max(math.ceil(fraction * len(sorted_samples)) - 1, 0)]
+
+class Metrics:
+    """
+    Per-route-class request counters and a sliding window of latencies
+    route classes: clean-URL rewrite, static asset, data JSON, API proxy, 404, other
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.classes = {
+            name: {'requests': 0, 'bytes': 0, 'latencies': deque(maxlen=window)}
+            for name in ROUTE_CLASSES
+        }
+        self.statuses = {}
+
+    def record(self, route_class, status, nbytes, seconds):
+        with self.lock:
+            stats = self.classes[route_class]
+            stats['requests'] += 1
+            stats['bytes'] += nbytes
+            stats['latencies'].append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def snapshot(self, cache=None, proxy=None):
+        """JSON-ready view of all counters, latencies in milliseconds"""
+        with self.lock:
+            classes = {
+                name: (stats['requests'], stats['bytes'], sorted(stats['latencies']))
+                for name, stats in self.classes.items()
+            }
+            statuses = dict(self.statuses)
+        routes = {}
+        for name, (requests, nbytes, samples) in classes.items():
+            routes[name] = {
+                'requests': requests,
+                'bytes': nbytes,
+                'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+            }
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'routes': routes,
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+            'cache': cache.stats() if cache is not None else None,
+            'proxy': proxy.stats() if proxy is not None else None,
+        }
+
+    def prometheus(self, cache=None, proxy=None):
+        """Prometheus text exposition of the same snapshot"""
+        snapshot = self.snapshot(cache, proxy)
+        lines = [
+            '# HELP serve_requests_total Requests served, by route class',
+            '# TYPE serve_requests_total counter',
+        ]
+        for name, stats in snapshot['routes'].items():
+            lines.append(f'serve_requests_total{{route="{name}"}} {stats["requests"]}')
+        lines += [
+            '# HELP serve_response_bytes_total Body bytes sent, by route class',
+            '# TYPE serve_response_bytes_total counter',
+        ]
+        for name, stats in snapshot['routes'].items():
+            lines.append(f'serve_response_bytes_total{{route="{name}"}} {stats["bytes"]}')
+        lines += [
+            '# HELP serve_request_duration_seconds Request latency over the recent window',
+            '# TYPE serve_request_duration_seconds summary',
+        ]
+        for name, stats in snapshot['routes'].items():
+            for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+                lines.append(f'serve_request_duration_seconds{{route="{name}",quantile="{quantile}"}} '
+                             f'{stats[key] / 1000:.6f}')
+        lines += [
+            '# HELP serve_responses_total Responses, by status code',
+            '# TYPE serve_responses_total counter',
+        ]
+        for code, count in snapshot['status_codes'].items():
+            lines.append(f'serve_responses_total{{code="{code}"}} {count}')
+        cache_stats = snapshot['cache']
+        if cache_stats is not None:
+            lines += [
+                '# HELP serve_cache_hit_ratio File cache hits over lookups',
+                '# TYPE serve_cache_hit_ratio gauge',
+                f'serve_cache_hit_ratio {cache_stats["hit_ratio"]}',
+                '# TYPE serve_cache_hits_total counter',
+                f'serve_cache_hits_total {cache_stats["hits"]}',
+                '# TYPE serve_cache_misses_total counter',
+                f'serve_cache_misses_total {cache_stats["misses"]}',
+                '# TYPE serve_cache_bytes gauge',
+                f'serve_cache_bytes {cache_stats["bytes"]}',
+                '# TYPE serve_cache_evicted_bytes_total counter',
+                f'serve_cache_evicted_bytes_total {cache_stats["evicted_bytes"]}',
+            ]
+        proxy_stats = snapshot['proxy']
+        if proxy_stats is not None:
+            lines += [
+                '# HELP serve_proxy_hits_total /proxy/ requests answered from the cache',
+                '# TYPE serve_proxy_hits_total counter',
+                f'serve_proxy_hits_total {proxy_stats["hits"]}',
+                '# HELP serve_proxy_misses_total /proxy/ misses fetched from the upstream',
+                '# TYPE serve_proxy_misses_total counter',
+                f'serve_proxy_misses_total {proxy_stats["upstream_fetches"]}',
+                '# HELP serve_proxy_stale_total /proxy/ requests answered stale after an upstream error',
+                '# TYPE serve_proxy_stale_total counter',
+                f'serve_proxy_stale_total {proxy_stats["stale"]}',
+                '# TYPE serve_proxy_upstream_errors_total counter',
+                f'serve_proxy_upstream_errors_total {proxy_stats["upstream_errors"]}',
+                '# TYPE serve_proxy_entries gauge',
+                f'serve_proxy_entries {proxy_stats["entries"]}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+class AccessLog:
+    """
+    Buffered, non-blocking log writer: request threads only enqueue lines and
+    a background thread writes them out in batches
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, name='serve-access-log', daemon=True)
+        self.thread.start()
+
+    def write(self, line):
+        self.queue.put(line)
+
+    def run(self):
+        while True:
+            line = self.queue.get()
+            batch = []
+            while line is not None:
+                batch.append(line)
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                stream = self.stream or sys.stdout
+                stream.write('\n'.join(batch) + '\n')
+                stream.flush()
+            if line is None:
+                return
+
+    def close(self):
+        """Flush everything queued so far and stop the writer"""
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram in the style of DDSketch: every quantile within
+    RUM_SKETCH_ACCURACY relative error, memory bounded by the value range,
+    and sketches merge by adding bucket counts
+    """
+
+    gamma = (1 + RUM_SKETCH_ACCURACY) / (1 - RUM_SKETCH_ACCURACY)
+    log_gamma = math.log(gamma)
+
+    def __init__(self):
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value < RUM_SKETCH_MIN:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            **{f'p{pct}': round(self.quantile(pct / 100), 4) for pct in RUM_PERCENTILES},
+        }
+
+class RumCollector:
+    """
+    Field performance from staging visitors: each beacon updates a running
+    sketch per (page, language, metric), and every RUM_FLUSH_INTERVAL the
+    sketches of that interval are appended to a JSON-lines file, buckets
+    included so intervals can be merged later
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.interval = {}
+        self.interval_started = time.time()
+        self.beacons = 0
+        self.rejected = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='serve-rum', daemon=True)
+        self.thread.start()
+
+    def record(self, page, lang, metrics):
+        """Add one beacon's values; returns how many were accepted"""
+        accepted = 0
+        with self.lock:
+            for name, value in metrics.items():
+                limit = RUM_METRICS.get(name)
+                if (limit is None or isinstance(value, bool) or not isinstance(value, (int, float))
+                        or not 0 <= value <= limit):
+                    continue
+                key = (page, lang, name)
+                for sketches in (self.totals, self.interval):
+                    sketch = sketches.get(key)
+                    if sketch is None:
+                        sketch = sketches[key] = QuantileSketch()
+                    sketch.add(value)
+                accepted += 1
+            if accepted:
+                self.beacons += 1
+            else:
+                self.rejected += 1
+        return accepted
+
+    def snapshot(self):
+        """{page: {lang: {metric: summary}}} since the server started"""
+        pages = {}
+        with self.lock:
+            for (page, lang, name), sketch in sorted(self.totals.items()):
+                pages.setdefault(page, {}).setdefault(lang, {})[name] = sketch.summary()
+            return {'beacons': self.beacons, 'rejected': self.rejected, 'pages': pages}
+
+    def run(self):
+        while not self.stopped.wait(RUM_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            interval, self.interval = self.interval, {}
+            started, self.interval_started = self.interval_started, time.time()
+        if not interval:
+            return
+        ended = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        lines = []
+        for (page, lang, name), sketch in sorted(interval.items()):
+            lines.append(json.dumps({
+                'start': datetime.fromtimestamp(started, timezone.utc).isoformat(timespec='seconds'),
+                'end': ended,
+                'page': page,
+                'lang': lang,
+                'metric': name,
+                **sketch.summary(),
+                'zeros': sketch.zeros,
+                'buckets': {str(key): count for key, count in sorted(sketch.buckets.items())},
+            }))
+        with open(self.path.replace('{pid}', str(os.getpid())), 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join(timeout=5)
+        self.flush()
+
+class ProxyEntry:
+    """One cached upstream response"""
+
+    __slots__ = ('status', 'body', 'content_type', 'fetched')
+
+    def __init__(self, status, body, content_type):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.fetched = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self.fetched
+
+class ProxyFlight:
+    """An upstream fetch in progress; concurrent misses wait on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = (None, 'ERROR')
+
+class ProxyCache:
+    """
+    Caching reverse proxy for the third-party JSON APIs the site calls
+    Fresh entries are served for their TTL; concurrent misses for the same
+    URL share one upstream request (single-flight); when the upstream fails
+    the last good response is served stale for up to PROXY_STALE_MAX
+    """
+
+    def __init__(self, upstreams, stale_max=PROXY_STALE_MAX, timeout=PROXY_TIMEOUT,
+                 max_entries=PROXY_MAX_ENTRIES):
+        # name -> (base URL, TTL seconds)
+        self.upstreams = upstreams
+        self.stale_max = stale_max
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+        self.errors = 0
+        self.stale = 0
+
+    def url_for(self, path, query):
+        """(upstream URL, TTL) for a /proxy/... request, or None if not proxied"""
+        name, _, rest = path[len(PROXY_PREFIX):].partition('/')
+        upstream = self.upstreams.get(name)
+        if upstream is None:
+            return None
+        base, ttl = upstream
+        url = base + ('/' + quote(rest) if rest else '')
+        return (url + '?' + query if query else url), ttl
+
+    def get(self, url, ttl):
+        """
+        (entry, state) where state is HIT, MISS or STALE; entry is None (state
+        ERROR) if the upstream failed and nothing usable is cached
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and entry.age() < ttl:
+                self.entries.move_to_end(url)
+                self.hits += 1
+                return entry, 'HIT'
+            flight = self.flights.get(url)
+            leader = flight is None
+            if leader:
+                flight = self.flights[url] = ProxyFlight()
+
+        if not leader:
+            flight.done.wait(self.timeout * 2)
+            entry, state = flight.result
+            if entry is not None:
+                with self.lock:
+                    if state == 'STALE':
+                        self.stale += 1
+                    else:
+                        self.hits += 1
+            return entry, ('HIT' if state == 'MISS' else state)
+
+        try:
+            fresh = self.fetch(url)
+        except (OSError, HTTPException, ValueError):
+            fresh = None
+        with self.lock:
+            if fresh is not None:
+                self.fetches += 1
+                self.entries[url] = fresh
+                self.entries.move_to_end(url)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                flight.result = (fresh, 'MISS')
+            else:
+                self.errors += 1
+                stale = self.entries.get(url)
+                if stale is not None and stale.age() < ttl + self.stale_max:
+                    self.stale += 1
+                    flight.result = (stale, 'STALE')
+            del self.flights[url]
+        flight.done.set()
+        return flight.result
+
+    def fetch(self, url):
+        """GET the upstream URL; raises on network errors and non-2xx answers"""
+        request = urllib.request.Request(url, headers={
+            'Accept': 'application/json',
+            'User-Agent': 'BetterSolano-serve.py',
+        })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read(PROXY_MAX_BODY + 1)
+            if len(body) > PROXY_MAX_BODY:
+                raise ValueError(f'{url}: response larger than {PROXY_MAX_BODY} bytes')
+            content_type = response.headers.get('Content-Type', 'application/json')
+            return ProxyEntry(response.status, body, content_type)
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'upstream_fetches': self.fetches,
+            'upstream_errors': self.errors,
+            'stale': self.stale,
+        }
+
+class LinkShaper:
+    """
+    One connection's emulated link: each request waits out the RTT (two on
+    the first, for the TCP handshake) plus its upload time, and response
+    bytes leave no faster than the download rate
+    Returns delays rather than sleeping, so both engines can wait their way
+    """
+
+    def __init__(self, profile):
+        self.down_rate = profile.down_kbps * 1000 / 8
+        self.up_rate = profile.up_kbps * 1000 / 8
+        self.rtt = profile.rtt_ms / 1000
+        self.handshake = True
+        # When the last queued response byte will have left
+        self.down_free = 0.0
+
+    def receive(self, nbytes):
+        """Seconds to hold a request of nbytes before handling it"""
+        delay = self.rtt * (2 if self.handshake else 1) + nbytes / self.up_rate
+        self.handshake = False
+        return delay
+
+    def send(self, nbytes):
+        """Seconds to wait before the next nbytes of a response may go out"""
+        now = time.monotonic()
+        # Sleep overshoot is caught up on; only a link idle for a whole chunk restarts
+        if now - self.down_free > SHAPED_CHUNK / self.down_rate:
+            self.down_free = now
+        self.down_free += nbytes / self.down_rate
+        return max(self.down_free - now, 0.0)
+
+class ShapedWriter:
+    """Socket writer that paces everything written through a LinkShaper"""
+
+    def __init__(self, raw, shaper):
+        self.raw = raw
+        self.shaper = shaper
+
+    def write(self, data):
+        view = memoryview(data)
+        for offset in range(0, len(view), SHAPED_CHUNK):
+            chunk = view[offset:offset + SHAPED_CHUNK]
+            time.sleep(self.shaper.send(len(chunk)))
+            self.raw.write(chunk)
+        return len(view)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+class HarLog:
+    """
+    Every request/response of a session, written out as a HAR 1.2 file when
+    the server stops; timings are the server's view (wait until headers,
+    receive while the body went out)
+    """
+
+    def __init__(self, path):
+        # With --processes each worker writes its own file: {pid} in the path
+        self.path = path
+        self.entries = deque(maxlen=HAR_MAX_ENTRIES)
+
+    def add(self, entry):
+        self.entries.append(entry)
+
+    def write(self):
+        path = self.path.replace('{pid}', str(os.getpid()))
+        har = {'log': {
+            'version': '1.2',
+            'creator': {'name': 'BetterSolano serve.py', 'version': '1.0'},
+            'pages': [],
+            'entries': list(self.entries),
+        }}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(har, f, indent=1)
+        return path
+
+class LiveReload:
+    """Change counter that open live-reload streams wait on"""
+
+    def __init__(self):
+        self.version = 0
+        self.paths = []
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def publish(self, paths):
+        with self.condition:
+            self.version += 1
+            self.paths = paths
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        """Block until a change after `version` (or timeout); returns the current version"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version or self.closed, timeout)
+            return self.version
+
+    def event(self):
+        return b'event: reload\ndata: ' + json.dumps(self.paths).encode() + b'\n\n'
+
+    def stream(self, connection, version):
+        """Write events (or a heartbeat) to one SSE connection until it or the server closes"""
+        try:
+            with connection:
+                while not self.closed:
+                    current = self.wait(version, LIVE_RELOAD_HEARTBEAT)
+                    if current != version:
+                        version = current
+                        connection.sendall(self.event())
+                    else:
+                        connection.sendall(b': ping\n\n')
+        except OSError:
+            pass
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class SiteWatcher:
+    """
+    Polls the source tree and, when the served directory is the build output,
+    has scripts/build.py --update rebuild just what the changed files feed
+    (minified, hashed, pre-rendered, compressed, packed); when serving the
+    sources directly, re-renders the --i18n pages they affect instead. Then
+    publishes the changed URLs to LiveReload
+    """
+
+    def __init__(self, source, target, live_reload, i18n=False):
+        self.source = source
+        self.target = target
+        # Serving the sources directly: nothing to build, only reload
+        self.mirror = os.path.realpath(source) != os.path.realpath(target)
+        # A served directory inside the source tree is output, never input
+        self.skip_dir = os.path.realpath(target) if self.mirror else None
+        self.live_reload = live_reload
+        self.i18n = i18n
+        self.files = self.scan()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='serve-watch', daemon=True)
+        self.thread.start()
+
+    def scan(self):
+        """{relative path: (mtime_ns, size)} for every file a build would copy"""
+        def excluded(name):
+            return any(fnmatch.fnmatchcase(name, pattern) for pattern in BUILD_EXCLUDES)
+
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(self.source):
+            dirnames[:] = [name for name in dirnames if not excluded(name)
+                           and os.path.realpath(os.path.join(dirpath, name)) != self.skip_dir]
+            prefix = os.path.relpath(dirpath, self.source).replace(os.sep, '/')
+            prefix = '' if prefix == '.' else prefix + '/'
+            for name in filenames:
+                if excluded(name):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                files[prefix + name] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def run(self):
+        while not self.stopped.wait(WATCH_INTERVAL):
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+
+    def check(self):
+        files = self.scan()
+        changed = sorted(rel for rel, stat in files.items() if self.files.get(rel) != stat)
+        removed = sorted(rel for rel in self.files if rel not in files)
+        self.files = files
+        if not changed and not removed:
+            return
+
+        started = time.perf_counter()
+        if self.mirror:
+            if not self.build(changed + removed):
+                return
+        elif self.i18n:
+            self.render_languages(changed)
+        self.live_reload.publish(['/' + rel for rel in changed + removed])
+        print(f"Rebuilt {len(changed) + len(removed)} file(s) in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms: {', '.join(changed + removed)}")
+        sys.stdout.flush()
+
+    def build(self, paths):
+        """Incremental production build of paths into the served dist/; False if it failed"""
+        result = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'build.py'), '--update', *paths],
+                                cwd=self.source, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Rebuild failed for {', '.join(paths)}:\n{(result.stdout + result.stderr).strip()}")
+            sys.stdout.flush()
+            return False
+        return True
+
+    def render_languages(self, changed):
+        """Re-render the language variants of changed pages (all of them for new translations)"""
+        if 'assets/js/translations.js' in changed:
+            pages = []
+        else:
+            pages = [rel for rel in changed if rel.endswith('.html')]
+            if not pages:
+                return
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'prerender-i18n.py'),
+                        self.target, *pages], stdout=subprocess.DEVNULL, check=False)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(timeout=5)
+
+class ServerState:
+    """
+    Route table, .htaccess rules, file cache, metrics and access log that
+    CleanURLHandler reads from self.server, whichever engine runs it
+    """
+
+    # Set by init_state after binding; closing may happen before that if bind fails
+    pool = None
+    access_log = None
+
+    def init_state(self, workers, cache_size, sendfile_threshold, htaccess, routes, cache, pack=None,
+                   proxy_upstreams=None, i18n=False, profile=None, har_path=None, live_reload=None,
+                   rum_path=None):
+        # routes/cache may be handed in already built, e.g. shared across fork()
+        # or read from a PackedSite
+        self.pack = pack
+        self.i18n = i18n
+        self.profile = profile
+        self.har = HarLog(har_path) if har_path else None
+        self.live_reload = live_reload
+        self.rum = RumCollector(rum_path) if rum_path else None
+        self.proxy = ProxyCache(proxy_upstreams) if proxy_upstreams else None
+        self.routes = routes if routes is not None else RouteTable('.')
+        self.htaccess = htaccess if htaccess is not None else Htaccess()
+        self.error_pages = ErrorPages(self.htaccess.error_documents, self.routes, pack)
+        self.metrics = Metrics()
+        self.access_log = AccessLog()
+        self.sendfile_threshold = sendfile_threshold
+        self.cache = cache
+        if cache is None and cache_size > 0:
+            self.cache = FileCache(cache_size, sendfile_threshold)
+        self.workers = workers
+        self.pool = None
+        if workers > 0:
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='serve-worker')
+
+    def close_state(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        if getattr(self, 'live_reload', None) is not None:
+            self.live_reload.close()
+        if getattr(self, 'rum', None) is not None:
+            self.rum.close()
+            self.rum = None
+        if getattr(self, 'har', None) is not None:
+            print(f"HAR: {len(self.har.entries)} entries written to {self.har.write()}")
+            self.har = None
+        if self.access_log is not None:
+            self.access_log.close()
+
+class CleanURLServer(ServerState, HTTPServer):
+    """
+    HTTPServer that hands each accepted connection to a bounded worker pool,
+    so one slow client or large download does not block everyone else
+    """
+
+    # Deeper accept backlog for bursts of parallel asset fetches
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS,
+                 cache_size=DEFAULT_CACHE_MB * 1024 * 1024,
+                 sendfile_threshold=DEFAULT_SENDFILE_KB * 1024, htaccess=None,
+                 routes=None, cache=None, reuse_port=False, pack=None, proxy_upstreams=None,
+                 i18n=False, profile=None, har_path=None, live_reload=None, rum_path=None):
+        # Pre-fork workers each bind their own socket to the same port and
+        # let the kernel spread connections across them
+        self.reuse_port = reuse_port
+        # Connections handed over to LiveReload.stream
+        self.streams = set()
+        super().__init__(server_address, handler_class)
+        self.init_state(workers, cache_size, sendfile_threshold, htaccess, routes, cache, pack,
+                        proxy_upstreams, i18n, profile, har_path, live_reload, rum_path)
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        if self.pool is None:
+            return super().process_request(request, client_address)
+        self.pool.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        """Same as HTTPServer.process_request, run on a pool thread"""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def shutdown_request(self, request):
+        # Live-reload streams are closed by their own thread
+        if request in self.streams:
+            self.streams.discard(request)
+            return
+        super().shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.close_state()
 
 class CleanURLHandler(SimpleHTTPRequestHandler):
     """
     Custom HTTP handler that supports clean URLs (without .html extension)
     Mimics the .htaccess rewrite rules used in cPanel deployment
     """
+
+    # Keep-alive lets a page's parallel asset fetches reuse connections
+    protocol_version = 'HTTP/1.1'
+
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # responses stall ~40 ms waiting for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    # Route-table file (relative to the served root) for the current request
+    route_target = None
+
+    # (offset, count) of the body file to hand to sendfile(), if any
+    sendfile_span = None
+
+    # Whether a status line has gone out for the current request
+    response_started = False
+
+    # Decoded request path before any rewriting, and when parsing finished
+    request_path = None
+    request_started = 0.0
+
+    # Route class for /__metrics, decided once the response is known
+    route_class = 'other'
+
+    # Negotiated page language under --i18n, if a pre-rendered variant was chosen
+    language = None
+
+    # Emulated link for this connection under --profile
+    shaper = None
+
+    # Seconds per Server-Timing phase, the response headers as sent and when
+    # they went out (for --har)
+    timings = None
+    response_headers = None
+    headers_sent = 0.0
+    response_headers_size = 0
+    request_wallclock = 0.0
+
+    # Body bytes written per request, for the access log
+    bytes_sendfile = 0
+    bytes_buffered = 0
+    pending_log = None
+
+    # MIME types from the .htaccess AddType rules
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        '.js': 'application/javascript',
+        '.json': 'application/json',
+        '.svg': 'image/svg+xml',
+        '.webmanifest': 'application/manifest+json',
+        '.woff': 'font/woff',
+        '.woff2': 'font/woff2',
+    }
+
+    def setup(self):
+        super().setup()
+        # A single-threaded server would stall on every idle keep-alive
+        # connection, so fall back to one request per connection there
+        if self.server.pool is None:
+            self.protocol_version = 'HTTP/1.0'
+        if self.server.profile is not None:
+            self.shaper = LinkShaper(self.server.profile)
+            self.wfile = ShapedWriter(self.wfile, self.shaper)
     
+    def handle_one_request(self):
+        # Still None in log_access if parse_request rejected the head, so
+        # keep-alive never reuses the previous request's headers
+        self.headers = None
+        self.route_target = None
+        self.request_path = None
+        self.route_class = 'other'
+        self.language = None
+        self.sendfile_span = None
+        self.response_started = False
+        self.bytes_sendfile = 0
+        self.bytes_buffered = 0
+        self.pending_log = None
+        self.timings = {}
+        self.response_headers = []
+        self.headers_sent = 0.0
+        try:
+            super().handle_one_request()
+        finally:
+            # Logged after the body so the byte counts are known
+            if self.pending_log is not None:
+                self.log_access()
+
+    def parse_request(self):
+        # Latency is measured from here, not from the keep-alive idle wait
+        self.request_started = time.perf_counter()
+        self.request_wallclock = time.time()
+        if not super().parse_request():
+            return False
+        if self.shaper is not None:
+            size = self.request_head_size() + int(self.headers.get('Content-Length') or 0)
+            time.sleep(self.shaper.receive(size))
+        return True
+
+    def request_head_size(self):
+        return len(self.raw_requestline) + len(self.headers.as_bytes())
+
+    def timed(self, phase, started):
+        """Add the time since `started` to a Server-Timing phase"""
+        self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - started
+
     def do_GET(self):
+        path = urlparse(self.path).path
+        if path == METRICS_PATH:
+            return self.send_metrics()
+        if path == LIVE_RELOAD_PATH and self.server.live_reload is not None:
+            return self.send_live_reload()
+        if path == RUM_PATH and self.server.rum is not None:
+            return self.send_json(self.server.rum.snapshot())
+        if self.server.proxy is not None and path.startswith(PROXY_PREFIX):
+            return self.guarded(self.send_proxy, rewrite=False)
+        self.guarded(super().do_GET)
+
+    def do_POST(self):
+        if self.server.rum is None or urlparse(self.path).path != RUM_PATH:
+            self.send_error(HTTPStatus.NOT_IMPLEMENTED, f"Unsupported method ({self.command!r})")
+            return
+        self.receive_rum()
+
+    def do_HEAD(self):
+        if urlparse(self.path).path == METRICS_PATH:
+            return self.send_metrics()
+        if self.server.proxy is not None and urlparse(self.path).path.startswith(PROXY_PREFIX):
+            return self.guarded(self.send_proxy, rewrite=False)
+        self.guarded(super().do_HEAD)
+
+    def guarded(self, method, rewrite=True):
+        """Run a request method, answering unexpected failures with a 500 page"""
+        try:
+            started = time.perf_counter()
+            if rewrite:
+                rewritten = self.rewrite_path()
+                self.timed('route', started)
+                if not rewritten:
+                    return
+            method()
+        except (ConnectionError, TimeoutError):
+            raise
+        except Exception:
+            traceback.print_exc()
+            if self.response_started:
+                raise
+            self.close_connection = True
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def send_response(self, code, message=None):
+        self.response_started = True
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        # While watching nothing may be cached past a rebuild; end_headers says no-cache
+        if self.server.live_reload is not None and keyword in ('Cache-Control', 'Expires'):
+            return
+        super().send_header(keyword, value)
+        self.response_headers.append((keyword, str(value)))
+        # Lets the page's scripts route API calls through /proxy/
+        if (keyword == 'Content-Type' and value.startswith('text/html')
+                and self.server.proxy is not None):
+            self.send_header('Set-Cookie', PROXY_COOKIE)
+        if (keyword == 'Content-Type' and value.startswith('text/html')
+                and self.server.rum is not None):
+            self.send_header('Set-Cookie', RUM_COOKIE)
+
+    def end_headers(self):
+        # Every response for a negotiated page, cached, streamed or 304
+        self.send_language_headers()
+        self.send_server_timing()
+        if self.server.live_reload is not None:
+            super().send_header('Cache-Control', 'no-cache')
+        self.response_headers_size = sum(map(len, getattr(self, '_headers_buffer', ()))) + 2
+        super().end_headers()
+        self.headers_sent = time.perf_counter()
+
+    def send_server_timing(self):
+        self.timings['total'] = time.perf_counter() - self.request_started
+        self.send_header('Server-Timing', ', '.join(
+            f'{phase};desc="{SERVER_TIMING_PHASES[phase]}";dur={self.timings[phase] * 1000:.3f}'
+            for phase in SERVER_TIMING_PHASES if phase in self.timings))
+
+    def rewrite_path(self):
+        """
+        Apply the .htaccess rewrite rules, then internally rewrite clean URLs
+        to the file the route table maps them to
+        Returns False when a redirect or error has already been sent
+        """
         # Parse the URL path
         parsed_path = urlparse(self.path)
         path = unquote(parsed_path.path)
-        
-        # Remove trailing slash for non-root paths
-        if path != '/' and path.endswith('/'):
-            # Check if this is a directory with index.html
-            dir_path = '.' + path
-            index_path = dir_path + 'index.html'
-            if os.path.isdir(dir_path) and os.path.isfile(index_path):
-                # Serve index.html from directory
-                return super().do_GET()
-        
-        # Try to serve the file directly first
-        file_path = '.' + path
-        
-        # If path doesn't have extension and file doesn't exist
-        if not os.path.exists(file_path) and not path.endswith('/'):
-            # Try adding .html extension
-            html_path = file_path + '.html'
-            if os.path.isfile(html_path):
-                # Internally rewrite to serve the .html file
-                self.path = path + '.html'
-                if parsed_path.query:
-                    self.path += '?' + parsed_path.query
-                return super().do_GET()
-        
-        # If it's a directory, try index.html
-        if os.path.isdir(file_path):
-            index_path = os.path.join(file_path, 'index.html')
-            if os.path.isfile(index_path):
-                self.path = path.rstrip('/') + '/index.html'
-                if parsed_path.query:
-                    self.path += '?' + parsed_path.query
-                return super().do_GET()
-        
-        # Fall back to default behavior
-        return super().do_GET()
+        query = parsed_path.query
+        self.request_path = path
+
+        routes = self.server.routes
+        routes.maybe_refresh()
+        htaccess = self.server.htaccess
+
+        env = {
+            'HTTPS': 'on',  # stands in for the production HTTPS vhost
+            'HTTP_HOST': self.headers.get('Host', ''),
+            'THE_REQUEST': self.requestline,
+            'REQUEST_METHOD': self.command,
+        }
+        outcome = htaccess.rewrite(path, query, env, routes)
+        if outcome[0] == 'redirect':
+            self.send_redirect(outcome[1], outcome[2])
+            return False
+        if outcome[0] == 'forbidden':
+            self.send_error(HTTPStatus.FORBIDDEN)
+            return False
+        if outcome[0] == 'gone':
+            self.send_error(HTTPStatus.GONE)
+            return False
+        _, path, query = outcome
+
+        # mod_dir's DirectorySlash, when emulating Apache
+        if htaccess.path is not None and not path.endswith('/') and routes.is_dir(path):
+            self.send_redirect(HTTPStatus.MOVED_PERMANENTLY, quote(path + '/') + ('?' + query if query else ''))
+            return False
+
+        if not htaccess.allows(os.path.basename(path.rstrip('/'))):
+            self.send_error(HTTPStatus.FORBIDDEN)
+            return False
+
+        target = routes.lookup(path)
+        if self.server.i18n and target is not None and target.endswith('.html'):
+            lang = self.negotiate_language()
+            variant = routes.language_variant(target, lang)
+            if variant is not None:
+                target = variant
+                self.language = lang
+        self.route_target = target
+
+        # Unknown paths fall back to default behavior (404, listings, dotfiles)
+        if target is None:
+            self.path = quote(path) + ('?' + query if query else '')
+            return True
+
+        self.path = '/' + quote(target)
+        if query:
+            self.path += '?' + query
+        return True
+
+    def negotiate_language(self):
+        """The visitor's language: the lang cookie, else the best Accept-Language match"""
+        try:
+            cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        except CookieError:
+            cookie = {}
+        if I18N_COOKIE in cookie and cookie[I18N_COOKIE].value in I18N_LANGS:
+            return cookie[I18N_COOKIE].value
+
+        best, best_q = I18N_LANGS[0], 0.0
+        accept = self.headers.get('Accept-Language')
+        if accept:
+            for tag, q in parse_accept_encoding(accept).items():
+                lang = I18N_ALIASES.get(tag.split('-')[0])
+                if lang is not None and q > best_q:
+                    best, best_q = lang, q
+        return best
+
+    def send_language_headers(self):
+        if self.language is not None:
+            self.send_header('Content-Language', self.language)
+        if self.server.i18n and self.route_target is not None and self.route_target.endswith('.html'):
+            self.send_header('Vary', 'Cookie, Accept-Language')
+
+    def send_live_reload(self):
+        """GET /__livereload: a Server-Sent Events stream with one event per rebuild"""
+        live = self.server.live_reload
+        version = live.version
+        self.close_connection = True
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        self.wfile.flush()
+        # A stream stays open as long as the page does: it gets a thread of
+        # its own instead of holding a pool worker
+        self.server.streams.add(self.connection)
+        threading.Thread(target=live.stream, args=(self.connection, version),
+                         name='serve-livereload', daemon=True).start()
+
+    def send_live_page(self, entry):
+        """A page with the live-reload snippet added before </body>"""
+        body = entry.read()
+        end = body.lower().rfind(b'</body>')
+        end = len(body) if end < 0 else end
+        body = body[:end] + LIVE_RELOAD_SNIPPET + body[end:]
+        self.send_response(HTTPStatus.OK)
+        for keyword, value in entry.headers:
+            self.send_header(keyword, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def receive_rum(self):
+        """
+        POST /__rum: {"page": "/faq/", "lang": "fil", "metrics": {"LCP": 1830, ...}}
+        or one web-vitals metric, {"page": ..., "lang": ..., "name": "LCP", "value": 1830}
+        """
+        self.route_class = None
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if not 0 < length <= RUM_MAX_BODY:
+            self.close_connection = True
+            self.send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE if length > 0 else HTTPStatus.LENGTH_REQUIRED)
+            return
+        try:
+            beacon = json.loads(self.rfile.read(length))
+            metrics = beacon['metrics'] if 'metrics' in beacon else {beacon['name']: beacon['value']}
+            if not isinstance(metrics, dict):
+                raise ValueError('metrics is not an object')
+        except (ValueError, KeyError, TypeError):
+            self.send_error(HTTPStatus.BAD_REQUEST, "Malformed beacon")
+            return
+
+        # Known routes and languages only, so stray beacons can't grow memory
+        page = str(beacon.get('page') or '')
+        page = page if self.server.routes.lookup(page) is not None else '(other)'
+        lang = beacon.get('lang')
+        lang = lang if lang in I18N_LANGS else '(other)'
+        if not self.server.rum.record(page, lang, metrics):
+            self.send_error(HTTPStatus.BAD_REQUEST, "No known metrics in beacon")
+            return
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.end_headers()
+
+    def send_json(self, data):
+        body = json.dumps(data, indent=2).encode('utf-8')
+        self.route_class = None
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+        self.bytes_buffered += len(body)
+
+    def send_metrics(self):
+        """GET or HEAD /__metrics: JSON by default, Prometheus text on request"""
+        server = self.server
+        query = urlparse(self.path).query
+        if 'format=prometheus' in query or 'text/plain' in self.headers.get('Accept', ''):
+            body = server.metrics.prometheus(server.cache, server.proxy).encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(server.metrics.snapshot(server.cache, server.proxy), indent=2).encode('utf-8')
+            content_type = 'application/json'
+        self.route_class = None
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+            self.bytes_buffered += len(body)
+
+    def classify(self, status):
+        """Route class of the finished request for /__metrics"""
+        if self.server.proxy is not None and (self.request_path or '').startswith(PROXY_PREFIX):
+            return 'proxy'
+        if status == HTTPStatus.NOT_FOUND:
+            return '404'
+        target = self.route_target
+        if target is None or not 200 <= status < 400:
+            return 'other'
+        if self.request_path != '/' + target:
+            return 'rewrite'
+        if target.startswith('data/') and target.endswith('.json'):
+            return 'data'
+        return 'static'
+
+    def send_proxy(self):
+        """GET /proxy/<name>/...: the upstream API response, from cache when fresh"""
+        parsed_path = urlparse(self.path)
+        self.request_path = unquote(parsed_path.path)
+        target = self.server.proxy.url_for(self.request_path, parsed_path.query)
+        if target is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "Unknown proxy upstream")
+            return
+        url, ttl = target
+        entry, state = self.server.proxy.get(url, ttl)
+        if entry is None:
+            self.send_error(HTTPStatus.BAD_GATEWAY, "Upstream API unavailable")
+            return
+
+        age = int(entry.age())
+        self.send_response(entry.status)
+        self.send_header('Content-Type', entry.content_type)
+        self.send_header('Content-Length', str(len(entry.body)))
+        self.send_header('Cache-Control', f'public, max-age={max(ttl - age, 0)}')
+        self.send_header('Age', str(age))
+        self.send_header('X-Proxy-Cache', state)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(entry.body)
+            self.bytes_buffered += len(entry.body)
+
+    def send_redirect(self, status, location):
+        """Bodiless redirect, as produced by RewriteRule [R] and DirectorySlash"""
+        self.send_response(status)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_error(self, code, message=None, explain=None):
+        """Serve the .htaccess ErrorDocument for this status from memory, if any"""
+        page = self.server.error_pages.get(code)
+        if page is None:
+            return super().send_error(code, message, explain)
+
+        target, body = page
+        self.log_error("code %d, message %s", code, message)
+        self.send_response(code, message)
+        self.send_header('Content-Type', self.guess_type(target))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+            self.bytes_buffered += len(body)
+
+    def list_directory(self, path):
+        if not self.server.htaccess.indexes:
+            # Options -Indexes
+            self.send_error(HTTPStatus.FORBIDDEN)
+            return None
+        return super().list_directory(path)
+
+    def send_head(self):
+        """Serve routed files from the in-memory cache when possible"""
+        entry = None
+        if self.route_target is not None and self.server.cache is not None:
+            started = time.perf_counter()
+            entry = self.server.cache.get(self.route_target, self.cache_headers)
+            self.timed('cache', started)
+        if entry is None and self.server.pack is not None:
+            # Everything servable is in the pack; no disk to fall back to
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        if entry is None and self.route_target is not None:
+            # Cache off or file over its budget: same validators, encodings,
+            # ranges and caching headers, from an entry built for this request
+            entry = self.uncached_entry(self.route_target)
+        if entry is None:
+            return super().send_head()
+        if self.server.live_reload is not None and entry.content_type.startswith('text/html'):
+            return self.send_live_page(entry)
+
+        # Ranges address the identity bytes, like nginx's gzip module does
+        range_header = self.headers.get('Range')
+        if range_header is None:
+            started = time.perf_counter()
+            encoding, body = self.negotiate_encoding(entry)
+            self.timed('compress', started)
+        else:
+            encoding, body = None, entry.body
+        etag = entry.etag_for(encoding)
+
+        if self.not_modified(entry, etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', self.date_time_string(entry.mtime))
+            if entry.cache_control is not None:
+                self.send_header('Cache-Control', entry.cache_control)
+            self.send_expires(entry)
+            if entry.compressible:
+                self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return None
+
+        if range_header is not None and self.if_range_matches(entry, etag):
+            ranges = parse_byte_ranges(range_header, entry.size)
+            if ranges is not None:
+                return self.send_ranges(entry, etag, ranges)
+
+        length = entry.size if body is None else len(body)
+        source = self.open_body(entry, body, 0, length)
+        if source is None:
+            return None
+
+        self.send_response(HTTPStatus.OK)
+        for keyword, value in entry.headers:
+            self.send_header(keyword, value)
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', etag)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_expires(entry)
+        if entry.compressible:
+            self.send_header('Vary', 'Accept-Encoding')
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        return source
+
+    def uncached_entry(self, path):
+        """A CacheEntry for one response; large files get a stat()-based ETag instead of a hash pass"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        limit = self.server.sendfile_threshold or UNCACHED_READ_LIMIT
+        if stat.st_size < limit:
+            return load_entry(path, stat, self.cache_headers)
+        return CacheEntry(path, stat, None, self.cache_headers(path, stat),
+                          f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"')
+
+    def send_ranges(self, entry, etag, ranges):
+        """Answer a Range request with 206 (single or multipart) or 416"""
+        if not ranges:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{entry.size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            length = end + 1 - start
+            source = self.open_body(entry, entry.body, start, length)
+            if source is None:
+                return None
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            for keyword, value in entry.headers:
+                self.send_header(keyword, value)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{entry.size}')
+            self.send_expires(entry)
+        else:
+            boundary = secrets.token_hex(12)
+            try:
+                payload = multipart_byteranges(entry, ranges, boundary)
+            except OSError:
+                self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+                return None
+            length = len(payload)
+            source = io.BytesIO(payload)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header('Content-Type', f'multipart/byteranges; boundary={boundary}')
+            self.send_header('Last-Modified', self.date_time_string(entry.mtime))
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', etag)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        return source
+
+    def open_body(self, entry, body, start, length):
+        """
+        File-like source for a response body: an in-memory view of cached
+        bytes, or the file itself with a sendfile() span for large files
+        """
+        if body is not None:
+            return io.BytesIO(memoryview(body)[start:start + length])
+        try:
+            source = open(entry.path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        self.sendfile_span = (start, length)
+        return source
+
+    def copyfile(self, source, outputfile):
+        """Zero-copy sendfile() for large files, buffered copy for everything else"""
+        span = self.sendfile_span
+        threshold = self.server.sendfile_threshold
+        if span is None and threshold and isinstance(source, io.BufferedReader):
+            # Uncached file from SimpleHTTPRequestHandler.send_head
+            size = os.fstat(source.fileno()).st_size
+            if size >= threshold:
+                span = (0, size)
+
+        if span is not None and (self.shaper is not None or not threshold):
+            # sendfile() would go around the emulated link, or is turned off
+            offset, count = span
+            source.seek(offset)
+            while count > 0 and (chunk := source.read(min(COPY_BUFSIZE, count))):
+                outputfile.write(chunk)
+                self.bytes_buffered += len(chunk)
+                count -= len(chunk)
+            return
+
+        if span is not None:
+            offset, count = span
+            if count:
+                self.bytes_sendfile += self.connection.sendfile(source, offset, count)
+            return
+
+        while chunk := source.read(COPY_BUFSIZE):
+            outputfile.write(chunk)
+            self.bytes_buffered += len(chunk)
+
+    def if_range_matches(self, entry, etag):
+        """If-Range: honour the Range only if the validator is still current"""
+        if_range = self.headers.get('If-Range')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            # Strong comparison only
+            return if_range == etag
+        return if_range == self.date_time_string(entry.mtime)
+
+    def negotiate_encoding(self, entry):
+        """Pick the best Content-Encoding the client accepts; (None, body) for identity"""
+        accept = self.headers.get('Accept-Encoding')
+        if not accept or not entry.compressible:
+            return None, entry.body
+
+        prefs = parse_accept_encoding(accept)
+        wildcard = prefs.get('*', 0.0)
+        candidates = [(prefs.get(encoding, wildcard), encoding) for encoding in SIDECAR_SUFFIXES]
+        # Highest q-value wins; ties go to server preference order (br first)
+        for q, encoding in sorted(candidates, key=lambda c: -c[0]):
+            if q <= 0:
+                break
+            if self.server.cache is not None:
+                body = self.server.cache.variant(entry, encoding)
+            elif encoding in entry.variants:
+                body = entry.variants[encoding]
+            else:
+                # Uncached entries compress only bodies already in memory
+                body = entry.variants[encoding] = encode_entry(entry, encoding, entry.body is not None)
+            if body is not None:
+                return encoding, body
+        return None, entry.body
+
+    def cache_headers(self, path, stat):
+        """Response headers stored alongside a cached body (length varies by encoding)"""
+        return self.entry_headers(self.server.htaccess, path, stat)
+
+    @classmethod
+    def entry_headers(cls, htaccess, path, stat):
+        """
+        Headers for a cache entry; needs no request, so the cache can be
+        warmed before forking workers
+        """
+        return [
+            ('Content-Type', cls.content_type(path)),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+        ] + htaccess.file_headers(os.path.basename(path))
+
+    @classmethod
+    def content_type(cls, path):
+        """guess_type without a request; it only reads the class-level extensions_map"""
+        return SimpleHTTPRequestHandler.guess_type(cls, path)
+
+    def send_expires(self, entry):
+        """mod_expires: Expires plus a matching max-age unless .htaccess overrides Cache-Control"""
+        rule = self.server.htaccess.expires_for(entry.content_type)
+        if rule is None:
+            return
+        base, seconds = rule
+        now = time.time()
+        expires = (now if base == 'access' else entry.mtime) + seconds
+        if entry.cache_control is None:
+            self.send_header('Cache-Control', f'max-age={max(int(expires - now), 0)}')
+        self.send_header('Expires', self.date_time_string(expires))
+
+    def not_modified(self, entry, etag):
+        """
+        RFC 9110 conditional GET: If-None-Match (weak comparison) takes
+        precedence, otherwise If-Modified-Since against the file mtime
+        """
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if if_none_match.strip() == '*':
+                return True
+            tags = (tag.strip() for tag in if_none_match.split(','))
+            return any(tag.removeprefix('W/') == etag for tag in tags)
+
+        if 'If-Modified-Since' not in self.headers:
+            return False
+        try:
+            ims = parsedate_to_datetime(self.headers['If-Modified-Since'])
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if ims.tzinfo is None:
+            return False
+        return int(entry.mtime) <= ims.timestamp()
     
+    def log_request(self, code='-', size='-'):
+        if isinstance(code, HTTPStatus):
+            code = code.value
+        self.pending_log = code
+
+    def log_access(self):
+        """Access log line with body bytes split by sendfile vs buffered copy"""
+        status = self.pending_log
+        self.pending_log = None
+        if self.route_class is not None and isinstance(status, int):
+            self.route_class = self.classify(status)
+            self.server.metrics.record(self.route_class, status,
+                                       self.bytes_sendfile + self.bytes_buffered,
+                                       time.perf_counter() - self.request_started)
+            if self.server.har is not None and self.headers is not None:
+                self.server.har.add(self.har_entry(status))
+        self.log_message('"%s" %s sendfile=%d buffered=%d',
+                         self.requestline, str(status),
+                         self.bytes_sendfile, self.bytes_buffered)
+
+    def har_entry(self, status):
+        """This request/response as a HAR entry"""
+        finished = time.perf_counter()
+        headers_sent = self.headers_sent or finished
+        wait = (headers_sent - self.request_started) * 1000
+        receive = (finished - headers_sent) * 1000
+        target = self.requestline.split(' ')[1] if ' ' in self.requestline else '/'
+        url = f"http://{self.headers.get('Host', 'localhost')}{target}"
+        response_headers = dict((name.lower(), value) for name, value in self.response_headers)
+        body_size = self.bytes_sendfile + self.bytes_buffered
+        try:
+            status_text = HTTPStatus(status).phrase
+        except ValueError:
+            status_text = ''
+        return {
+            'startedDateTime': datetime.fromtimestamp(self.request_wallclock, timezone.utc)
+                                       .isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'time': round(wait + receive, 3),
+            'request': {
+                'method': self.command,
+                'url': url,
+                'httpVersion': self.request_version,
+                'cookies': [],
+                'headers': [{'name': name, 'value': value} for name, value in self.headers.items()],
+                'queryString': [{'name': name, 'value': value}
+                                for name, value in parse_qsl(urlparse(target).query, keep_blank_values=True)],
+                'headersSize': self.request_head_size(),
+                'bodySize': int(self.headers.get('Content-Length') or 0),
+            },
+            'response': {
+                'status': status,
+                'statusText': status_text,
+                'httpVersion': self.protocol_version,
+                'cookies': [],
+                'headers': [{'name': name, 'value': value} for name, value in self.response_headers],
+                'content': {'size': body_size, 'mimeType': response_headers.get('content-type', '')},
+                'redirectURL': response_headers.get('location', ''),
+                'headersSize': self.response_headers_size,
+                'bodySize': body_size,
+            },
+            'cache': {},
+            'timings': {'blocked': -1, 'dns': -1, 'connect': -1, 'send': 0,
+                        'wait': round(wait, 3), 'receive': round(receive, 3)},
+            '_serverTiming': {phase: round(seconds * 1000, 3) for phase, seconds in self.timings.items()},
+        }
+
     def log_message(self, format, *args):
-        # Custom logging with color for clean URL rewrites
+        # Custom logging with color for clean URL rewrites, handed to the
+        # buffered writer so logging never blocks the response
         message = format % args
-        if '.html' not in self.path and 'GET' in message:
+        if self.route_class == 'rewrite':
             # This was a clean URL that got rewritten
-            print(f"\033[0;32m{self.address_string()}\033[0m - {message}")
+            line = f"\033[0;32m{self.address_string()}\033[0m - {message}"
         else:
-            print(f"{self.address_string()} - {message}")
+            line = f"{self.address_string()} - {message}"
+        self.server.access_log.write(line)
+
+class AsyncCleanURLHandler(CleanURLHandler):
+    """
+    CleanURLHandler run by AsyncCleanURLServer: the request arrives already
+    read into memory and the response is collected rather than written, so
+    the event loop puts it on the wire (file bodies with loop.sendfile)
+    """
 
-def run_server(port=8888, directory='dist'):
+    # (file, offset, count) to send after the buffered bytes, if any
+    deferred_file = None
+
+    def __init__(self, server, client_address, data):
+        # BaseRequestHandler.__init__ would start handling right away
+        self.server = server
+        self.client_address = client_address
+        self.directory = server.directory
+        self.rfile = io.BytesIO(data)
+        self.wfile = io.BytesIO()
+        self.close_connection = True
+
+    def respond(self):
+        """Handle the request; returns the status line, headers and any buffered body"""
+        self.handle_one_request()
+        return self.wfile.getvalue()
+
+    def copyfile(self, source, outputfile):
+        if isinstance(source, io.BufferedReader):
+            # do_GET closes source as soon as this returns, so the loop gets
+            # its own descriptor
+            span = self.sendfile_span or (0, os.fstat(source.fileno()).st_size)
+            self.deferred_file = (open(os.dup(source.fileno()), 'rb'), *span)
+            return
+        body = source.read()
+        outputfile.write(body)
+        self.bytes_buffered += len(body)
+
+    def log_access(self):
+        # Logged by finish_access once the body is on the wire
+        pass
+
+    def finish_access(self):
+        if self.pending_log is not None:
+            super().log_access()
+
+class AsyncCleanURLServer(ServerState):
+    """
+    asyncio engine: one event loop owns every connection, so an idle
+    keep-alive connection costs a coroutine instead of a thread
+    Requests go through CleanURLHandler's logic on the worker pool (or
+    inline on the loop with workers=0); bodies go out via loop.sendfile()
+    """
+
+    def __init__(self, server_address, handler_class=AsyncCleanURLHandler, workers=DEFAULT_WORKERS,
+                 cache_size=DEFAULT_CACHE_MB * 1024 * 1024,
+                 sendfile_threshold=DEFAULT_SENDFILE_KB * 1024, htaccess=None,
+                 routes=None, cache=None, reuse_port=False, pack=None, proxy_upstreams=None,
+                 i18n=False, profile=None, har_path=None, live_reload=None, rum_path=None):
+        # Bound here, like HTTPServer, so a taken port fails at construction
+        self.socket = socket.create_server(server_address, backlog=ASYNC_BACKLOG, reuse_port=reuse_port)
+        self.server_address = self.socket.getsockname()[:2]
+        self.handler_class = handler_class
+        self.directory = os.getcwd()
+        self.loop = None
+        self.stopped = None
+        self.init_state(workers, cache_size, sendfile_threshold, htaccess, routes, cache, pack,
+                        proxy_upstreams, i18n, profile, har_path, live_reload, rum_path)
+
+    def serve_forever(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        server = await asyncio.start_server(self.handle_connection, sock=self.socket,
+                                            limit=MAX_REQUEST_HEAD)
+        async with server:
+            await self.stopped.wait()
+
+    def shutdown(self):
+        """Stop serve_forever() from another thread"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+
+    def server_close(self):
+        self.socket.close()
+        self.close_state()
+
+    async def handle_connection(self, reader, writer):
+        client_address = writer.get_extra_info('peername')
+        shaper = LinkShaper(self.profile) if self.profile is not None else None
+        try:
+            while True:
+                data = await self.read_request(reader)
+                if data is None:
+                    break
+                if shaper is not None:
+                    await asyncio.sleep(shaper.receive(len(data)))
+                if self.live_reload is not None and data.startswith(b'GET ' + LIVE_RELOAD_PATH.encode() + b' '):
+                    await self.stream_live_reload(writer)
+                    break
+                handler = self.handler_class(self, client_address, data)
+                if self.pool is None:
+                    output = handler.respond()
+                else:
+                    output = await self.loop.run_in_executor(self.pool, handler.respond)
+                if shaper is not None:
+                    await self.send_shaped(writer, shaper, handler, output)
+                else:
+                    await self.send_output(writer, handler, output)
+                handler.finish_access()
+                if handler.close_connection:
+                    break
+        except (ConnectionError, TimeoutError):
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            writer.close()
+
+    async def stream_live_reload(self, writer):
+        """The /__livereload stream, polled on the loop instead of holding a worker"""
+        live = self.live_reload
+        writer.write(LIVE_RELOAD_HEAD)
+        await writer.drain()
+        version = live.version
+        while not live.closed:
+            waited = 0.0
+            while live.version == version and not live.closed and waited < LIVE_RELOAD_HEARTBEAT:
+                await asyncio.sleep(WATCH_INTERVAL)
+                waited += WATCH_INTERVAL
+            if live.version != version:
+                version = live.version
+                writer.write(live.event())
+            else:
+                writer.write(b': ping\n\n')
+            await writer.drain()
+
+    async def send_output(self, writer, handler, output):
+        """Write a response: buffered bytes, then any file body via loop.sendfile()"""
+        writer.write(output)
+        if handler.deferred_file is not None:
+            source, offset, count = handler.deferred_file
+            try:
+                if count:
+                    handler.bytes_sendfile += await self.loop.sendfile(
+                        writer.transport, source, offset, count)
+            finally:
+                source.close()
+        await writer.drain()
+
+    async def send_shaped(self, writer, shaper, handler, output):
+        """Write a response, file body included, at the emulated link's pace"""
+        async def write(data):
+            for offset in range(0, len(data), SHAPED_CHUNK):
+                chunk = data[offset:offset + SHAPED_CHUNK]
+                await asyncio.sleep(shaper.send(len(chunk)))
+                writer.write(chunk)
+                await writer.drain()
+
+        await write(memoryview(output))
+        if handler.deferred_file is not None:
+            source, offset, count = handler.deferred_file
+            try:
+                source.seek(offset)
+                while count > 0 and (chunk := source.read(min(COPY_BUFSIZE, count))):
+                    await write(chunk)
+                    handler.bytes_buffered += len(chunk)
+                    count -= len(chunk)
+            finally:
+                source.close()
+
+    async def read_request(self, reader):
+        """
+        Request head plus any Content-Length body, or None once the client
+        hangs up, idles past the keep-alive timeout or sends too much
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+            match = CONTENT_LENGTH_RE.search(head)
+            length = int(match[1]) if match else 0
+            if length > MAX_REQUEST_BODY:
+                return None
+            body = b''
+            if length:
+                body = await asyncio.wait_for(reader.readexactly(length), KEEP_ALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, TimeoutError):
+            return None
+        return head + body
+
+def print_cache_stats(cache, label='Cache'):
+    stats = cache.stats()
+    print(f"{label}: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_ratio']:.1%} hit ratio), "
+          f"{stats['evictions']} evictions ({stats['evicted_bytes'] / 1048576:.1f} MB evicted)")
+
+def serve_prefork(processes, make_server):
+    """
+    Fork `processes` workers that each run make_server() on their own
+    SO_REUSEPORT socket; restart any that die, stop all on Ctrl+C
+    Everything built before this call (route table, warmed cache) is shared
+    copy-on-write with the workers
+    """
+    children = {}
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.default_int_handler)
+                httpd = make_server()
+                try:
+                    httpd.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    httpd.server_close()
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    # Stop the workers on SIGTERM as well as Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    # Objects that exist now are never collected in the workers, which keeps
+    # the GC from dirtying (and so copying) the shared pages
+    gc.freeze()
+    for _ in range(processes):
+        spawn()
+
+    try:
+        while children:
+            pid, status = os.wait()
+            started = children.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if time.monotonic() - started < PREFORK_STARTUP_GRACE:
+                print(f"Worker {pid} exited during startup (status {code}); stopping")
+                break
+            print(f"Worker {pid} exited (status {code}); restarting")
+            spawn()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            # A second Ctrl+C or SIGTERM (timeout, a service manager) must
+            # not cut the reaping short with a traceback
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            for pid in children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in list(children):
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+        except KeyboardInterrupt:
+            pass
+        print("\nServer stopped.")
+
+def run_server(port=8888, directory='dist', workers=DEFAULT_WORKERS, cache_mb=DEFAULT_CACHE_MB,
+               sendfile_kb=DEFAULT_SENDFILE_KB, htaccess_path=None, processes=0, engine='threads',
+               pack_path=None, proxy_upstreams=None, i18n=False, profile=None, har_path=None,
+               watch=False, rum_path=None):
     """Run the development server with clean URL support"""
-    
+
+    if watch and (pack_path is not None or processes > 0 or cache_mb <= 0):
+        print("Error: --watch needs a directory (not --pack), one process and the file cache")
+        sys.exit(1)
+    # The tree the server was started from is the source of the served build
+    source = os.getcwd()
+
+    # Relative to where the server was started, not the served directory
+    if rum_path is not None:
+        rum_path = os.path.abspath(rum_path)
+        if processes > 0:
+            stem, ext = os.path.splitext(rum_path)
+            rum_path = f'{stem}.{{pid}}{ext or ".jsonl"}'
+    if har_path is not None:
+        har_path = os.path.abspath(har_path)
+        if processes > 0:
+            stem, ext = os.path.splitext(har_path)
+            har_path = f'{stem}.{{pid}}{ext or ".har"}'
+
+    # A packed snapshot replaces the served directory entirely
+    pack = None
+    if pack_path is not None:
+        try:
+            pack = PackedSite(pack_path)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot load pack '{pack_path}': {e}")
+            sys.exit(1)
+
     # Change to the specified directory
-    if directory != '.':
+    if pack is None and directory != '.':
         if not os.path.isdir(directory):
             print(f"Error: Directory '{directory}' not found")
             sys.exit(1)
         os.chdir(directory)
+
+    if processes > 0 and not (hasattr(os, 'fork') and hasattr(socket, 'SO_REUSEPORT')):
+        print("Error: --processes needs fork() and SO_REUSEPORT (Linux/macOS)")
+        sys.exit(1)
     
+    # Caching policy from the .htaccess that ships with the build
+    if pack is not None and htaccess_path is None and '.htaccess' in pack.files:
+        htaccess_path = f'{pack_path}:.htaccess'
+        htaccess = Htaccess(htaccess_path, pack.text('.htaccess'))
+    else:
+        if htaccess_path is None:
+            htaccess_path = '.htaccess'
+        htaccess = Htaccess(htaccess_path) if os.path.isfile(htaccess_path) else None
+
+    # The read-only snapshot of the served tree, built once
+    cache_size = int(cache_mb * 1024 * 1024)
+    sendfile_threshold = int(sendfile_kb * 1024)
+    if pack is not None:
+        routes = PackRouteTable(pack)
+        cache = PackCache(pack)
+    else:
+        routes = RouteTable('.')
+        cache = FileCache(cache_size, sendfile_threshold) if cache_size > 0 else None
+
+    live_reload = watcher = None
+    if watch and os.path.realpath(source) != os.path.realpath(os.getcwd()):
+        # Anything but the sources themselves is rebuilt by scripts/build.py,
+        # which only writes the project's own dist/
+        project = os.path.dirname(SCRIPTS_DIR)
+        if (os.path.realpath(source) != os.path.realpath(project)
+                or os.path.realpath(os.getcwd()) != os.path.realpath(os.path.join(project, 'dist'))):
+            print("Error: --watch serves the sources (-d .) or rebuilds dist/ (-d dist), "
+                  "run from the project root")
+            sys.exit(1)
+    if watch:
+        live_reload = LiveReload()
+        watcher = SiteWatcher(source, os.getcwd(), live_reload, i18n)
+
     server_address = ('', port)
-    httpd = HTTPServer(server_address, CleanURLHandler)
+    if engine == 'asyncio':
+        server_class, handler_class = AsyncCleanURLServer, AsyncCleanURLHandler
+    else:
+        server_class, handler_class = CleanURLServer, CleanURLHandler
+    make_server = partial(server_class, server_address, handler_class, workers=workers,
+                          sendfile_threshold=sendfile_threshold, htaccess=htaccess,
+                          routes=routes, cache=cache, cache_size=cache_size,
+                          reuse_port=processes > 0, pack=pack, proxy_upstreams=proxy_upstreams,
+                          i18n=i18n, profile=NETWORK_PROFILES.get(profile), har_path=har_path,
+                          live_reload=live_reload, rum_path=rum_path)
+
+    preloaded = None
+    if processes > 0 and cache is not None:
+        header_factory = partial(CleanURLHandler.entry_headers, htaccess or Htaccess())
+        preloaded = cache.preload(sorted(set(routes.files.values())), header_factory)
     
     print("=" * 60)
     print("Clean URL Development Server")
     print("=" * 60)
-    print(f"Serving from: {os.getcwd()}")
+    if pack is not None:
+        print(f"Serving from: {os.path.abspath(pack_path)} ({len(pack.files)} files, "
+              f"{pack.size / 1048576:.1f} MB, one read-only mmap)")
+    else:
+        print(f"Serving from: {os.getcwd()}")
     print(f"Server running at: http://localhost:{port}")
+    print(f"Route table: {len(routes.routes)} routes")
+    print(f"Metrics: http://localhost:{port}{METRICS_PATH} (?format=prometheus)")
+    if processes > 0:
+        print(f"Pre-fork: {processes} processes sharing one snapshot (SO_REUSEPORT, metrics per process)")
+    if engine == 'asyncio':
+        pool = f"{workers} worker threads" if workers > 0 else "no worker threads"
+        print(f"Concurrency: asyncio event loop ({pool}), HTTP/1.1 keep-alive, loop.sendfile()")
+    elif workers > 0:
+        print(f"Concurrency: {workers} worker threads, HTTP/1.1 keep-alive")
+    else:
+        print("Concurrency: single-threaded (HTTP/1.0)")
+    if pack is not None:
+        print("File cache: not needed, bodies and encoded variants come from the pack")
+    elif cache is not None:
+        print(f"File cache: {cache_mb:g} MB LRU")
+        if preloaded is not None:
+            print(f"  preloaded {preloaded[0]} files ({preloaded[1] / 1048576:.1f} MB) before fork")
+    else:
+        print("File cache: disabled")
+    if profile is not None:
+        link = NETWORK_PROFILES[profile]
+        print(f"Network profile: {profile} ({link.down_kbps:g}/{link.up_kbps:g} kbit/s down/up, "
+              f"{link.rtt_ms:g} ms RTT per connection)")
+    elif sendfile_kb > 0 and pack is None:
+        print(f"sendfile(): files of {sendfile_kb:g} KB and up")
+    if proxy_upstreams:
+        for name, (base, ttl) in proxy_upstreams.items():
+            print(f"API proxy: {PROXY_PREFIX}{name} → {base} (TTL {ttl}s, stale-on-error)")
+    if i18n:
+        if routes.language_files:
+            print(f"Languages: {', '.join(I18N_LANGS)} ({len(routes.language_files)} pre-rendered pages, "
+                  f"cookie '{I18N_COOKIE}' then Accept-Language)")
+        else:
+            print(f"Languages: no pre-rendered pages under {I18N_DIR}/ "
+                  f"(run scripts/prerender-i18n.py), serving the originals")
+    print("Server-Timing: route, cache, compress and total on every response")
+    if watcher is not None:
+        target = 'serving it directly' if not watcher.mirror else f'rebuilt into {os.getcwd()}'
+        print(f"Watching: {source} ({len(watcher.files)} files, {target}; "
+              f"pages reload via {LIVE_RELOAD_PATH}, caching off)")
+    if har_path is not None:
+        print(f"HAR: session written to {har_path} on exit")
+    if rum_path is not None:
+        print(f"RUM: beacons at {RUM_PATH} (summary: GET {RUM_PATH}), "
+              f"appended to {rum_path} every {RUM_FLUSH_INTERVAL}s")
+    if htaccess is not None:
+        print(f"Caching policy: {htaccess_path} ({len(htaccess.expires_by_type)} ExpiresByType rules, "
+              f"{len(htaccess.files_match)} FilesMatch blocks)")
+        for line in htaccess.unsupported_rules:
+            print(f"  skipped (unsupported variable): {line}")
+    else:
+        print("Caching policy: none (no .htaccess found)")
     print()
     print("Clean URLs supported:")
     print("  /services/certificates  →  serves certificates.html")
@@ -89,18 +3089,93 @@ def run_server(port=8888, directory='dist'):
     print()
     print("Press Ctrl+C to stop")
     print("=" * 60)
-    
+    sys.stdout.flush()
+
+    if processes > 0:
+        return serve_prefork(processes, make_server)
+
+    # Stopped by SIGTERM too (e.g. from CI), so the HAR and stats get written
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    httpd = make_server()
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
-        print("\nServer stopped.")
-        httpd.server_close()
+        try:
+            # As in serve_prefork: a repeat signal must not cut the HAR,
+            # RUM and access-log flush short with a traceback
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            print("\nServer stopped.")
+            if httpd.cache is not None:
+                print_cache_stats(httpd.cache)
+            if watcher is not None:
+                watcher.stop()
+            httpd.server_close()
+        except KeyboardInterrupt:
+            pass
 
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='Local server with clean URL support')
     parser.add_argument('-p', '--port', type=int, default=8888, help='Port number (default: 8888)')
     parser.add_argument('-d', '--directory', type=str, default='dist', help='Directory to serve (default: dist)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Worker threads for concurrent serving, 0 for single-threaded (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_CACHE_MB, metavar='MB',
+                        help=f'In-memory file cache size in MB, 0 to disable (default: {DEFAULT_CACHE_MB})')
+    parser.add_argument('--sendfile-threshold', type=float, default=DEFAULT_SENDFILE_KB, metavar='KB',
+                        help=f'Send files of at least this size with zero-copy sendfile(), 0 to disable (default: {DEFAULT_SENDFILE_KB})')
+    parser.add_argument('--htaccess', type=str, default=None, metavar='PATH',
+                        help='Apache config to take caching headers from (default: .htaccess in the served directory)')
+    parser.add_argument('--processes', type=int, default=0, metavar='N',
+                        help='Pre-fork N worker processes on one port with SO_REUSEPORT (default: 0, single process)')
+    parser.add_argument('--engine', choices=ENGINES, default='threads',
+                        help='threads: a pool thread per connection; asyncio: one event loop for all '
+                             'connections, the pool only handles requests (default: threads)')
+    parser.add_argument('--pack', metavar='FILE',
+                        help='Serve a packed site snapshot (from scripts/pack-site.py) via mmap instead of --directory')
+    parser.add_argument('--proxy', action='store_true',
+                        help='Serve /proxy/weather and /proxy/fx: cached, coalesced calls to the '
+                             'weather and exchange-rate APIs used by the info bar')
+    parser.add_argument('--proxy-upstream', action='append', default=[], metavar='NAME=URL',
+                        help='Point a proxy route at another base URL, e.g. a local stand-in '
+                             '(repeatable; implies --proxy)')
+    parser.add_argument('--profile', choices=NETWORK_PROFILES,
+                        help='Emulate a mobile link on every connection: added RTT plus download/upload '
+                             'bandwidth caps (sendfile() is bypassed so bodies are paced)')
+    parser.add_argument('--har', metavar='FILE',
+                        help='Record every request of the session and write it as a HAR file on exit '
+                             '(one FILE.<pid>.har per worker with --processes)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Rebuild what each saved source file feeds into dist/ (scripts/build.py --update), '
+                             'or serve the sources with -d ., and reload open pages over Server-Sent Events')
+    parser.add_argument('--rum', metavar='FILE',
+                        help=f'Collect web-vitals beacons from visitors at {RUM_PATH} and append '
+                             f'per-page percentile sketches to FILE every {RUM_FLUSH_INTERVAL}s')
+    parser.add_argument('--i18n', action='store_true',
+                        help='Serve pages pre-rendered by scripts/prerender-i18n.py in the language '
+                             'chosen by the lang cookie or Accept-Language')
     args = parser.parse_args()
+    if args.workers < 0:
+        parser.error('--workers must be 0 or greater')
+    if args.cache_size < 0:
+        parser.error('--cache-size must be 0 or greater')
+    if args.sendfile_threshold < 0:
+        parser.error('--sendfile-threshold must be 0 or greater')
+    if args.processes < 0:
+        parser.error('--processes must be 0 or greater')
+    proxy_upstreams = None
+    if args.proxy or args.proxy_upstream:
+        proxy_upstreams = dict(PROXY_UPSTREAMS)
+        for spec in args.proxy_upstream:
+            name, _, url = spec.partition('=')
+            if name not in PROXY_UPSTREAMS or not url.startswith(('http://', 'https://')):
+                parser.error(f'--proxy-upstream expects NAME=URL with NAME one of '
+                             f'{", ".join(PROXY_UPSTREAMS)}, got {spec!r}')
+            proxy_upstreams[name] = (url.rstrip('/'), PROXY_UPSTREAMS[name][1])
     
-    run_server(port=args.port, directory=args.directory)
+    run_server(port=args.port, directory=args.directory, workers=args.workers,
+               cache_mb=args.cache_size, sendfile_kb=args.sendfile_threshold,
+               htaccess_path=args.htaccess, processes=args.processes, engine=args.engine,
+               pack_path=args.pack, proxy_upstreams=proxy_upstreams, i18n=args.i18n,
+               profile=args.profile, har_path=args.har, watch=args.watch, rum_path=args.rum)
@@ -116,7 +116,11 @@ function isStaticAsset(url) {
  * Determine if a request is for a data/API endpoint
  */
 function isDataRequest(url) {
-  return url.pathname.startsWith('/data/') || url.hostname !== self.location.hostname;
+  return (
+    url.pathname.startsWith('/data/') ||
+    url.pathname.startsWith('/proxy/') ||
+    url.hostname !== self.location.hostname
+  );
 }
 
 // ─── Fetch Strategies ───────────────────────────────────────────────────────